@@ -0,0 +1,230 @@
+# api.py
+"""
+API HTTP/JSON (ASGI puro, sem framework) com os mesmos cálculos da
+interface, a partir do mesmo catálogo/snapshot (ver service.py).
+
+    uvicorn api:app --port 8000
+    DATA_SOURCE=/caminho/planilha.csv uvicorn api:app   # arquivo local no lugar da planilha
+
+Rotas:
+    GET  /health        versão da planilha e quantidade de produtos
+    GET  /metrics       métricas no formato texto do Prometheus
+    POST /margem        um item  -> um resultado
+    POST /margem/lote   {"itens": [...]} -> {"resultados": [...]}
+
+Formato do item: ver `service.quote_batch`. Pedidos de /margem que chegam
+juntos são agrupados (micro-batching) e calculados numa única chamada
+vetorizada; /margem/lote já é um lote.
+"""
+import asyncio
+import json
+import logging
+
+from metrics import METRICS, stage
+from service import CatalogService, quote_batch
+
+log = logging.getLogger(__name__)
+
+MAX_BATCH = 256      # itens por cálculo agrupado
+MAX_WAIT = 0.002     # segundos esperando mais pedidos antes de calcular
+MAX_BODY = 10 * 2**20
+MAX_ITEMS = 10_000   # itens por pedido em /margem/lote
+
+
+def _reject_constant(nome: str):
+    raise ValueError(f"Constante não suportada: {nome}")
+
+
+def _dumps(corpo) -> bytes:
+    return json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+
+
+class MicroBatcher:
+    """
+    Junta itens enviados por corrotinas diferentes e chama `fn(itens)` uma
+    vez por lote (até `max_batch` itens ou `max_wait` segundos), numa thread.
+    """
+
+    def __init__(self, fn, max_batch: int = MAX_BATCH, max_wait: float = MAX_WAIT):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+        self._tasks = set()  # lotes em cálculo (referência até terminarem)
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((item, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pendentes, self._pending = self._pending, []
+        if not pendentes:
+            return
+        # fn pode recarregar o catálogo (segundos): numa thread, fora do loop
+        task = asyncio.ensure_future(self._run(pendentes))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, pendentes):
+        try:
+            resultados = await asyncio.to_thread(self.fn, [item for item, _ in pendentes])
+        except Exception as e:
+            log.exception("Falha no cálculo agrupado")
+            for _, fut in pendentes:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), res in zip(pendentes, resultados):
+            if not fut.done():
+                fut.set_result(res)
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class MarginAPI:
+    def __init__(self, service: CatalogService | None = None):
+        self._service = service
+        self.batcher = MicroBatcher(self._quote)
+
+    @property
+    def service(self) -> CatalogService:
+        if self._service is None:  # só cria (e baixa a planilha) no primeiro uso
+            self._service = CatalogService()
+        return self._service
+
+    def _quote(self, itens: list) -> list[dict]:
+        with stage("compute"):
+            return quote_batch(self.service.get(), itens)
+
+    # ---------- ASGI ----------
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        with stage("api"):
+            try:
+                status, corpo, tipo = await self._route(scope, receive)
+            except HTTPError as e:
+                status, corpo, tipo = e.status, {"erro": str(e)}, "json"
+            except Exception:
+                log.exception("Erro na API")
+                status, corpo, tipo = 500, {"erro": "Erro interno"}, "json"
+            await self._respond(send, status, corpo, tipo)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup":
+                try:
+                    # Carrega o catálogo antes do primeiro pedido
+                    await asyncio.to_thread(self.service.get)
+                except Exception:
+                    log.exception("Catálogo indisponível na inicialização; nova tentativa no primeiro pedido")
+                await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _route(self, scope, receive):
+        metodo, caminho = scope["method"], scope["path"].rstrip("/") or "/"
+        rotas = {
+            ("GET", "/health"): self._health,
+            ("GET", "/metrics"): self._metrics,
+            ("POST", "/margem"): self._margem,
+            ("POST", "/margem/lote"): self._lote,
+        }
+        handler = rotas.get((metodo, caminho))
+        if handler is None:
+            if any(c == caminho for _, c in rotas):
+                raise HTTPError(405, "Método não permitido")
+            raise HTTPError(404, "Rota não encontrada")
+        if metodo == "POST":
+            return await handler(await self._read_json(receive))
+        return await handler()
+
+    async def _health(self):
+        catalogo = await self._catalog()
+        return 200, {"status": "ok", "versao": catalogo["versao"], "produtos": len(catalogo["produtos"]),
+                     "filiais": catalogo["branches"]}, "json"
+
+    async def _metrics(self):
+        return 200, METRICS.prometheus_text(), "text"
+
+    async def _margem(self, item):
+        await self._catalog()
+        resultado = await self.batcher.submit(item)
+        return (400 if "erro" in resultado else 200), resultado, "json"
+
+    async def _lote(self, corpo):
+        itens = corpo.get("itens") if isinstance(corpo, dict) else None
+        if not isinstance(itens, list):
+            raise HTTPError(400, "Envie {\"itens\": [...]}")
+        if len(itens) > MAX_ITEMS:
+            raise HTTPError(413, f"Máximo de {MAX_ITEMS} itens por pedido")
+        await self._catalog()
+        # Lote grande: cálculo e serialização numa thread, sem travar os outros pedidos
+        dados = await asyncio.to_thread(lambda: _dumps({"resultados": self._quote(itens)}))
+        return 200, dados, "json"
+
+    async def _catalog(self) -> dict:
+        try:
+            # Pode baixar a planilha (partida a frio): fora do loop de eventos
+            return await asyncio.to_thread(self.service.get)
+        except Exception as e:
+            log.exception("Falha ao carregar o catálogo")
+            raise HTTPError(503, f"Planilha indisponível: {e}") from e
+
+    @staticmethod
+    async def _read_json(receive):
+        partes, tamanho = [], 0
+        while True:
+            msg = await receive()
+            corpo = msg.get("body", b"")
+            tamanho += len(corpo)
+            if tamanho > MAX_BODY:
+                raise HTTPError(413, "Corpo muito grande")
+            partes.append(corpo)
+            if not msg.get("more_body"):
+                break
+        try:
+            # NaN/Infinity não são JSON: o json do Python aceitaria por padrão
+            return json.loads(b"".join(partes) or b"null", parse_constant=_reject_constant)
+        except ValueError:
+            raise HTTPError(400, "JSON inválido") from None
+
+    @staticmethod
+    async def _respond(send, status: int, corpo, tipo: str):
+        if tipo == "json":
+            dados = corpo if isinstance(corpo, bytes) else _dumps(corpo)  # bytes: já serializado
+            content_type = b"application/json; charset=utf-8"
+        else:
+            dados = corpo.encode("utf-8")
+            content_type = b"text/plain; version=0.0.4; charset=utf-8"
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", content_type),
+                                (b"content-length", str(len(dados)).encode())]})
+        await send({"type": "http.response.body", "body": dados})
+
+
+def create_app(service: CatalogService | None = None) -> MarginAPI:
+    """App ASGI; em testes, passe um CatalogService apontando para um arquivo local."""
+    return MarginAPI(service)
+
+
+app = create_app()
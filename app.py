@@ -1,68 +1,90 @@
 # app.py
+import io
+import os
+import time
+import numpy as np
 import streamlit as st
+# Importação direta de propósito: st.data_editor e st.dataframe importam o
+# pandas (e o pyarrow) mesmo recebendo dict, e a aba "Produto novo" usa os
+# dois. Adiar estes imports não encurta a primeira renderização; os módulos
+# abaixo somam ~15 ms depois do pandas.
 import pandas as pd
-import unicodedata
+
+from catalog import BRANCH_ES, BRANCH_SP, branch_label, default_weights, margin_branches
+from formatting import fmt_int, fmt_money, fmt_pct
+from history import STATUS_CHANGED, STATUS_NEW, STATUS_REMOVED, SnapshotHistory, diff_versions
+from margin import MarginResult, break_even_discount, compute_margin, sensitivity_grid, vary_share
+from metrics import METRICS, stage
+from proposals import write_enriched_csv
+from report import (catalog_margins, format_region_columns, region_columns, region_csv, report_columns,
+                    to_csv_bytes, to_parquet_bytes)
+from service import SHEET_ID, SHEET_NAME, shared_service, sheet_source
 
 # ================= Config =================
 st.set_page_config(page_title="Calculadora de Margem", layout="wide", page_icon="📊")
 
-# Planilha pública
-SHEET_ID = "19-evG-LmVdYxHXNgaeAzAOk3DNzX5G8znqcIdQwgni0"
-SHEET_NAME = None  # None => primeira aba; use "HARDINPUT" p/ forçar
+# Planilha e origem dos dados: ver service.py (SHEET_ID, DATA_SOURCE, SHEET_TTL)
+SEARCH_LIMIT = 50  # opções enviadas ao select de produto
+# Painel de desempenho na barra lateral: DEBUG_PANEL=1 ou ?debug=1 na URL
+DEBUG_PANEL = os.environ.get("DEBUG_PANEL") == "1"
+
+# Execuções completas do script nesta sessão (reruns de fragment não contam); ver branch_editor
+st.session_state["_execucao"] = st.session_state.get("_execucao", 0) + 1
 
 # ================= Utils =================
-def fmt_currency(v: float) -> str:
-    try:
-        return f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return f"R$ {v:.2f}"
-
-def fmt_int(n: int) -> str:
-    return f"{int(n):,}".replace(",", ".")
-
-def normalize(s: str) -> str:
-    if s is None:
-        return ""
-    s = str(s).strip().lower()
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    s = s.replace("\u00a0", " ")
-    s = " ".join(s.split())
-    return s
-
-@st.cache_data(ttl=300)
-def fetch_sheet_public(sheet_id: str, sheet_name: str | None = None) -> pd.DataFrame:
-    url = (
-        f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv&sheet={sheet_name}"
-        if sheet_name else
-        f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv"
+# Catálogo do processo (service.shared_service): um snapshot por processo, com o
+# arquivo em disco compartilhado entre processos (contadores snapshot_cache), e
+# o índice refeito só quando o conteúdo da planilha muda. É o mesmo que
+# server.py carrega na partida.
+def load_catalog(sheet_id: str, sheet_name: str | None = None) -> dict:
+    return shared_service(sheet_id, sheet_name).get()
+
+# Versões anteriores da planilha (em disco, ao lado do snapshot)
+def snapshot_history(sheet_id: str, sheet_name: str | None = None) -> SnapshotHistory:
+    return shared_service(sheet_id, sheet_name).history
+
+# ======= Resultados memorizados (chave = entradas) =======
+# Com os fragments, mexer num widget só reexecuta a aba dele; estes caches
+# evitam refazer o cálculo pesado quando as entradas não mudaram.
+@st.cache_resource(max_entries=8, show_spinner=False)
+def catalog_report(versao: str, branches: tuple, params: tuple, ordenar_por: str, crescente: bool,
+                   _tabela: pd.DataFrame) -> pd.DataFrame:
+    # Compartilhado entre sessões: só leitura
+    df = catalog_margins(_tabela, branches, **dict(params))
+    return df.sort_values(ordenar_por, ascending=crescente, kind="stable", ignore_index=True)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def version_diff(antes: str, depois: str, branches: tuple, params: tuple, _history: SnapshotHistory) -> pd.DataFrame:
+    # Compartilhado entre sessões: só leitura
+    df = diff_versions(_history.load(antes), _history.load(depois), branches, **dict(params))
+    return df.sort_values("Variação da margem (p.p.)", kind="stable", ignore_index=True)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def sensitivity_tables(preco: float, custos: tuple, impostos: tuple, pesos: tuple, indice: int,
+                       rotulo: str, desc_max: float, qtd_max: int, pontos: int,
+                       shares: tuple, share_sel: float, metrica: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    descontos = np.linspace(0.0, desc_max, pontos)
+    qtds = np.unique(np.linspace(0, qtd_max, pontos).round())
+    cenarios = vary_share(pesos, indice, shares)
+    params = dict(preco=preco, custos=custos, impostos=impostos, pesos=cenarios)
+    grid = sensitivity_grid(descontos=descontos, quantidades=qtds, **params)
+    campo = "margem_total" if metrica == "Margem (%)" else "lucro_bruto"
+    valores = grid[campo][shares.index(share_sel)]
+
+    d_grid, q_grid = np.meshgrid(descontos, qtds, indexing="ij")
+    df_heat = pd.DataFrame({
+        "Desconto (%)": d_grid.ravel().round(2),
+        "Quantidade": q_grid.ravel().astype(int),
+        metrica: valores.ravel(),
+    })
+
+    # Desconto de equilíbrio (lucro bruto = 0) por quantidade, uma linha por cenário
+    equilibrio = break_even_discount(quantidades=qtds, **params)
+    df_equilibrio = pd.DataFrame(
+        equilibrio.T, index=pd.Index(qtds.astype(int), name="Quantidade"),
+        columns=[f"{rotulo} {v:g}%" for v in shares],
     )
-    df = pd.read_csv(url, dtype=str)
-    df.columns = [normalize(c) for c in df.columns]
-    return df
-
-def parse_money_ptbr(x: str) -> float:
-    if x is None:
-        return 0.0
-    s = str(x)
-    s = s.replace(".", "").replace(",", ".")
-    s = "".join(ch for ch in s if (ch.isdigit() or ch in ".-"))
-    try:
-        return float(s)
-    except:
-        return 0.0
-
-def parse_number_loose(x: str) -> float:
-    """
-    Interpreta valores em en-US (1234.56) ou pt-BR (1.234,56) e com/sem 'R$'.
-    """
-    if x is None:
-        return 0.0
-    s = str(x).strip().replace("R$", "").replace("\u00a0", "").replace(" ", "")
-    try:
-        return float(s)
-    except:
-        return parse_money_ptbr(s)
+    return df_heat, df_equilibrio
 
 def big_metric(label: str, value_str: str):
     st.markdown(
@@ -75,116 +97,188 @@ def big_metric(label: str, value_str: str):
         unsafe_allow_html=True,
     )
 
+def branch_editor(branches, key: str, com_custo: bool = False) -> pd.DataFrame:
+    """
+    Tabela editável com uma linha por filial: % das vendas e imposto (e o
+    custo, para o produto novo, onde as filiais também podem ser incluídas).
+    """
+    df = pd.DataFrame({
+        "Filial": [branch_label(b, long=not com_custo) for b in branches],
+        "% das vendas": default_weights(branches),
+        "Imposto (%)": 0.0,
+    })
+    if com_custo:
+        df.insert(1, "Custo (R$)", 0.0)
+
+    # O data_editor não tem persist_state: quando a aba fecha, as edições se
+    # perdem. Guarda o último valor e, se o editor não apareceu na execução
+    # anterior (aba fechada), recomeça dele com uma chave nova.
+    execucao = st.session_state.get("_execucao", 0)
+    geracao, base = 0, df
+    salvo = st.session_state.get(f"_{key}_salvo")  # (execução, geração, base, valor)
+    if salvo is not None and (com_custo or salvo[3]["Filial"].tolist() == df["Filial"].tolist()):
+        ultima, geracao, base, valor = salvo
+        if ultima < execucao - 1:
+            geracao, base = geracao + 1, valor
+    editado = st.data_editor(
+        base, key=f"{key}_{geracao}", hide_index=True, width="stretch",
+        num_rows="dynamic" if com_custo else "fixed",
+        column_config={
+            "Filial": st.column_config.TextColumn(disabled=not com_custo),
+            "Custo (R$)": st.column_config.NumberColumn(min_value=0.0, step=1.0, format="%.2f"),
+            "% das vendas": st.column_config.NumberColumn(min_value=0.0, max_value=100.0, step=1.0, format="%.2f"),
+            "Imposto (%)": st.column_config.NumberColumn(min_value=0.0, max_value=100.0, step=0.5, format="%.2f"),
+        },
+    )
+    editado = editado.fillna({c: 0.0 for c in editado.columns if c != "Filial"})
+    st.session_state[f"_{key}_salvo"] = (execucao, geracao, base, editado)
+    if editado["% das vendas"].sum() == 0 and len(editado):
+        st.warning("Percentuais somam 0%. Usando divisão igual entre as filiais.")
+    return editado
+
+def render_results(regioes, r: MarginResult):
+    # ======= Tabela por região =======
+    st.markdown("---")
+    st.subheader("📊 Resultados por Região")
+
+    with stage("render"):
+        # Colunas já formatadas em pt-BR (sem Styler)
+        st.dataframe(format_region_columns(region_columns(r, regioes)), width="stretch", hide_index=True)
+
+    # ======= Totais =======
+    st.markdown("---")
+    st.subheader("🧮 Totais")
+    t1, t2, t3, t4, t5, t6, t7 = st.columns(7)
+    with t1: big_metric("Unidades", fmt_int(r.unidades))
+    with t2: big_metric("Faturamento", fmt_money(r.faturamento))
+    with t3: big_metric("Impostos totais", fmt_money(r.imp_total))
+    with t4: big_metric("Receita Líquida", fmt_money(r.receita_liquida))
+    with t5: big_metric("( - ) CMV", fmt_money(r.custo_total))
+    with t6: big_metric("Lucro Bruto", fmt_money(r.lucro_bruto))
+    with t7: big_metric("Margem Bruta", fmt_pct(r.margem_total))
+
+def render_download(regioes, r: MarginResult, file_name: str):
+    # ======= Download em planilha (CSV) =======
+    st.markdown("---")
+    st.download_button(
+        "📥 Baixar resultados",
+        data=region_csv(r, regioes),
+        file_name=file_name,
+        mime="text/csv",
+    )
+
+def render_sensitivity(preco_exist: float, custos_exist: list, impostos_exist: np.ndarray,
+                       pesos_exist: np.ndarray, branches):
+    """Mapa de calor e desconto de equilíbrio do produto existente."""
+    sc = st.columns(4)
+    with sc[0]:
+        desc_max_sens = st.number_input("Desconto máximo (%)", min_value=0.0, max_value=100.0,
+                                        value=30.0, step=1.0, format="%.2f", key="desc_max_sens",
+                                        persist_state="session")
+    with sc[1]:
+        qtd_max_sens = st.number_input("Quantidade máxima (un.)", min_value=1, step=100,
+                                       value=10_000, key="qtd_max_sens", persist_state="session")
+    with sc[2]:
+        pontos_sens = st.number_input("Pontos por eixo", min_value=5, max_value=200, step=5,
+                                      value=100, key="pontos_sens", persist_state="session")
+    with sc[3]:
+        metrica_sens = st.radio("Métrica", options=["Margem (%)", "Lucro (R$)"], key="metrica_sens",
+                                persist_state="session")
+
+    # A filial escolhida varia de 0 a 100% das vendas; as demais dividem o resto
+    indice_sens = st.selectbox("Filial variada", options=range(len(branches)),
+                               format_func=lambda i: branch_label(branches[i], long=True),
+                               key="filial_sens", persist_state="session")
+    rotulo_sens = branch_label(branches[indice_sens])
+    soma_pesos = pesos_exist.sum()
+    share_atual = round(100.0 * pesos_exist[indice_sens] / soma_pesos, 2) if soma_pesos \
+        else round(100.0 / len(branches), 2)
+    shares_sens = sorted({0.0, 25.0, 50.0, 75.0, 100.0, share_atual}) if len(branches) > 1 else [100.0]
+    share_sel = st.select_slider(f"% {rotulo_sens} no mapa de calor", options=shares_sens,
+                                 value=share_atual if share_atual in shares_sens else shares_sens[0],
+                                 format_func=lambda v: f"{v:g}% {rotulo_sens}",
+                                 key="share_sens", persist_state="session")
+
+    with stage("compute"):
+        df_heat, df_equilibrio = sensitivity_tables(
+            preco_exist, tuple(custos_exist), tuple(impostos_exist), tuple(pesos_exist),
+            int(indice_sens), rotulo_sens, desc_max_sens, int(qtd_max_sens), int(pontos_sens),
+            tuple(shares_sens), share_sel, metrica_sens,
+        )
+    import altair as alt  # ~0,5 s de importação; só este gráfico usa
+
+    heatmap = alt.Chart(df_heat).mark_rect().encode(
+        x=alt.X("Quantidade:O", axis=alt.Axis(labelOverlap=True)),
+        y=alt.Y("Desconto (%):O", sort="descending", axis=alt.Axis(labelOverlap=True)),
+        color=alt.Color(f"{metrica_sens}:Q", scale=alt.Scale(scheme="redyellowgreen", domainMid=0)),
+        tooltip=["Desconto (%)", "Quantidade", alt.Tooltip(f"{metrica_sens}:Q", format=",.2f")],
+    )
+    with stage("render"):
+        st.altair_chart(heatmap, width="stretch")
+
+        st.caption("Desconto de equilíbrio (%) por quantidade — acima dele o lucro bruto fica negativo.")
+        st.line_chart(df_equilibrio)
+
 # ================= App =================
 st.title("📊 Calculadora de Margem")
 
-tab_exist, tab_new = st.tabs(["Produto existente", "Produto novo"])
+# Só a aba aberta executa (trocar de aba reexecuta o app): quem usa apenas o
+# "Produto novo" não carrega a planilha. Os widgets das abas usam
+# persist_state="session" para manter os valores enquanto a aba está fechada.
+tab_exist, tab_new, tab_catalog, tab_bulk = st.tabs(
+    ["Produto existente", "Produto novo", "Catálogo completo", "Propostas em lote"],
+    key="aba", on_change="rerun",
+)
 
 # --------- ABA 1: PRODUTO EXISTENTE ---------
-with tab_exist:
+@st.fragment
+def render_existing_tab():
     try:
-        df = fetch_sheet_public(SHEET_ID, SHEET_NAME)
+        catalogo = load_catalog(SHEET_ID, SHEET_NAME)
     except Exception as e:
-        df = None
+        catalogo = None
         st.error(f"Erro ao carregar planilha pública: {e}")
 
-    if df is None or df.empty:
+    if catalogo is None or not catalogo["linhas"]:
         st.warning("Planilha vazia ou inacessível.")
     else:
-        st.caption("Fonte: Google Sheets")
-
-        # Detecta colunas
-        candidates_prod  = ["produto", "produto_nome", "nome", "sku", "codigo", "código", "item"]
-        candidates_cost  = ["custo", "custo medio", "custo médio", "custo unitario",
-                            "custo unitário", "average_cost", "average cost",
-                            "preco_custo", "preço de custo"]
-        candidates_branch = ["branch", "filial"]
-        candidates_prod_name = [  # <---- NOVO BLOCO
-            "product_name",
-            "product name",
-            "nome_produto",
-            "nome produto",
-            "descricao",
-            "descrição",
-        ]
-
-        col_prod       = next((c for c in candidates_prod if c in df.columns), None)
-        col_cost       = next((c for c in candidates_cost if c in df.columns), None)
-        col_branch     = next((c for c in candidates_branch if c in df.columns), None)
-        col_avg_price  = "average_price" if "average_price" in df.columns else None
-        col_prod_name  = next((c for c in candidates_prod_name if c in df.columns), None)  # <---- ALTERADO
-
-        if not col_prod or not col_cost:
-            st.warning(f"Não encontrei colunas de produto/custo. Colunas: {list(df.columns)}")
+        st.caption(f"Fonte: {sheet_source(SHEET_ID, SHEET_NAME).label}")
+
+        if not catalogo["produtos"]:
+            st.warning("Nenhum produto encontrado na planilha.")
         else:
-            # Select de produto (com busca ao digitar)
-            produtos = (
-                df[col_prod].astype(str).str.strip()
-                .replace({"": None}).dropna().drop_duplicates().tolist()
+            invalidos = catalogo["invalidos"]
+            if invalidos["custo"] or invalidos["preco"]:
+                st.caption(f"⚠️ Valores não reconhecidos na planilha (considerados 0): "
+                           f"{invalidos['custo']} custo(s), {invalidos['preco']} preço(s).")
+
+            # Busca no índice; o select recebe só os melhores resultados
+            busca = st.text_input("Buscar produto (código ou nome)", key="busca_produto", persist_state="session")
+            opcoes = catalogo["busca"].search(busca, limit=SEARCH_LIMIT)
+            if not opcoes:
+                st.warning("Nenhum produto encontrado para a busca.")
+                return
+            if st.session_state.get("produto_existente") not in opcoes:
+                st.session_state.pop("produto_existente", None)
+            produto_sel = st.selectbox(
+                f"Produto ({len(opcoes)} de {fmt_int(len(catalogo['produtos']))})", options=opcoes,
+                format_func=lambda c: f"{c} — {catalogo['itens'][c]['nome']}" if catalogo["itens"][c]["nome"] else c,
+                key="produto_existente", persist_state="session",
             )
-            produto_sel = st.selectbox("Produto (digite para buscar)", options=produtos, key="produto_existente")
 
-            # Subconjunto do produto
-            df_prod = df[df[col_prod].astype(str).str.strip() == str(produto_sel).strip()].copy()
+            # Dados do produto já indexados
+            item = catalogo["itens"].get(str(produto_sel).strip(), {"nome": "", "custos": {}, "preco": 0.0})
 
             # ===== Nome do produto vindo da planilha (product_name ou similares) =====
-            nome_produto_planilha = ""
-            if col_prod_name and not df_prod.empty:
-                serie_nome = (
-                    df_prod[col_prod_name].astype(str)
-                    .str.strip()
-                    .replace({"": None, "nan": None})
-                    .dropna()
-                )
-                if not serie_nome.empty:
-                    nome_produto_planilha = serie_nome.iloc[0]
-
             st.text_input(
                 "Nome do produto (planilha)",
-                value=nome_produto_planilha,
+                value=item["nome"],
                 disabled=True
             )
             # ============================================================
 
-            # Captura custos por branch: SP (VP-01) e ES (VP-06)
-            custo_sp_val = None
-            custo_es_val = None
-            row_sp = None
-            row_es = None
-            if col_branch and not df_prod.empty:
-                branch_series = df_prod[col_branch].astype(str).str.strip().str.upper()
-                row_sp = df_prod[branch_series == "VP-01"]
-                row_es = df_prod[branch_series == "VP-06"]
-
-                if not row_sp.empty:
-                    custo_sp_val = parse_money_ptbr(str(row_sp[col_cost].iloc[0]))
-                if not row_es.empty:
-                    custo_es_val = parse_money_ptbr(str(row_es[col_cost].iloc[0]))
-
             # ===== Preço de venda: somente da planilha (average_price da VP-01) =====
-            preco_exist_default = 0.0
-            if col_avg_price and not df_prod.empty:
-                # tenta primeiro pegar o average_price da VP-01 (igual ao custo)
-                serie_preco_sp = pd.Series(dtype=str)
-                if row_sp is not None and not row_sp.empty:
-                    serie_preco_sp = (
-                        row_sp[col_avg_price].astype(str)
-                        .str.strip()
-                        .replace({"": None, "nan": None})
-                        .dropna()
-                    )
-                if not serie_preco_sp.empty:
-                    preco_exist_default = parse_number_loose(serie_preco_sp.iloc[0]) or 0.0
-                else:
-                    # fallback: qualquer average_price do produto
-                    serie_preco = (
-                        df_prod[col_avg_price].astype(str)
-                        .str.strip()
-                        .replace({"": None, "nan": None})
-                        .dropna()
-                    )
-                    if not serie_preco.empty:
-                        preco_exist_default = parse_number_loose(serie_preco.iloc[0]) or 0.0
+            preco_exist_default = item["preco"]
 
             # Exibe o preço de venda como TEXTO somente leitura (sempre atualiza)
             st.text_input(
@@ -196,261 +290,337 @@ with tab_exist:
             preco_exist = float(preco_exist_default)
             # ===============================================================
 
-            # Campos imutáveis com os custos encontrados
-            csp, ces = st.columns(2)
-            with csp:
-                st.text_input("Custo São Paulo (VP-01)",
-                              value=("—" if custo_sp_val is None else f"{custo_sp_val:.2f}"),
-                              disabled=True)
-            with ces:
-                st.text_input("Custo Espírito Santo (VP-06)",
-                              value=("—" if custo_es_val is None else f"{custo_es_val:.2f}"),
-                              disabled=True)
+            # Campos imutáveis com os custos encontrados (uma filial por campo;
+            # planilha sem filiais: um campo só, sem custo)
+            branches = margin_branches(catalogo["branches"])
+            custos_exist = [item["custos"].get(b) for b in branches]
+            col_custos = st.columns(max(1, min(len(branches), 4)))
+            for i, (b, custo) in enumerate(zip(branches, custos_exist)):
+                with col_custos[i % len(col_custos)]:
+                    st.text_input(f"Custo {branch_label(b, long=True)}",
+                                  value=("—" if custo is None else f"{custo:.2f}"),
+                                  disabled=True)
 
             # ===== Entradas (COM desconto, igual à aba 2) =====
             col_desc_exist = st.columns(2)
             with col_desc_exist[0]:
-                desc_tipo_exist = st.radio("Tipo de desconto", options=["%", "R$"], horizontal=True, key="desc_tipo_exist")
+                desc_tipo_exist = st.radio("Tipo de desconto", options=["%", "R$"], horizontal=True,
+                                           key="desc_tipo_exist", persist_state="session")
             with col_desc_exist[1]:
                 desc_valor_exist = st.number_input(f"Desconto ({desc_tipo_exist})", min_value=0.0, step=0.5,
-                                                   format="%.2f", key="desc_valor_exist")
+                                                   format="%.2f", key="desc_valor_exist", persist_state="session")
 
-            # Distribuição e impostos
+            # Distribuição e impostos por filial
             qtd_vendas_exist = st.number_input("Quantidade de Vendas (un.)", min_value=0, step=1, value=0,
-                                               key="qtd_exist")
-            pct_sp_exist = st.number_input("% SP", min_value=0.0, max_value=100.0, step=1.0, value=50.0,
-                                           format="%.2f", key="pct_sp_exist")
-            pct_es_exist = st.number_input("% ES", min_value=0.0, max_value=100.0, step=1.0, value=50.0,
-                                           format="%.2f", key="pct_es_exist")
-
-            col_imp_exist = st.columns(2)
-            with col_imp_exist[0]:
-                imposto_sp_pct_exist = st.number_input("Imposto SP (%)", min_value=0.0, max_value=100.0,
-                                                       step=0.5, value=0.0, format="%.2f", key="imp_sp_exist")
-            with col_imp_exist[1]:
-                imposto_es_pct_exist = st.number_input("Imposto ES (%)", min_value=0.0, max_value=100.0,
-                                                       step=0.5, value=0.0, format="%.2f", key="imp_es_exist")
-
-            # Split normalizado
-            total_pct_exist = pct_sp_exist + pct_es_exist
-            if total_pct_exist == 0:
-                w_sp, w_es = 0.5, 0.5
-                st.warning("Percentuais somam 0%. Usando 50%/50%.")
-            else:
-                w_sp = pct_sp_exist / total_pct_exist
-                w_es = pct_es_exist / total_pct_exist
-
-            un_sp = int(round(qtd_vendas_exist * w_sp))
-            un_es = int(qtd_vendas_exist - un_sp)
-
-            # Preço líquido COM desconto
-            if desc_tipo_exist == "%":
-                preco_liq = preco_exist * (1 - desc_valor_exist / 100.0)
-            else:
-                preco_liq = max(preco_exist - desc_valor_exist, 0.0)
-
-            # Cálculos regionais
-            receita_sp = preco_liq * un_sp
-            receita_es = preco_liq * un_es
-
-            imp_sp_val = receita_sp * (imposto_sp_pct_exist / 100.0)
-            imp_es_val = receita_es * (imposto_es_pct_exist / 100.0)
-
-            # Custos por região (se ausente, considera 0)
-            custo_sp_unit = custo_sp_val or 0.0
-            custo_es_unit = custo_es_val or 0.0
-            custo_sp_total = custo_sp_unit * un_sp
-            custo_es_total = custo_es_unit * un_es
-
-            lucro_sp = receita_sp - imp_sp_val - custo_sp_total
-            lucro_es = receita_es - imp_es_val - custo_es_total
-            margem_sp = (lucro_sp / receita_sp * 100.0) if receita_sp > 0 else 0.0
-            margem_es = (lucro_es / receita_es * 100.0) if receita_es > 0 else 0.0
-
-            # Totais
-            faturamento = preco_exist * (un_sp + un_es)
-            descontos_totais = (preco_exist - preco_liq) * (un_sp + un_es)
-            imp_total = imp_sp_val + imp_es_val
-            receita_liquida = faturamento - descontos_totais - imp_total
-            custo_total = custo_sp_total + custo_es_total
-            lucro_bruto_total = receita_liquida - custo_total
-            margem_total = (lucro_bruto_total / receita_liquida * 100.0) if receita_liquida > 0 else 0.0
-
-            # ======= Tabela por região =======
-            st.markdown("---")
-            st.subheader("📊 Resultados por Região")
-
-            df_reg_exist = pd.DataFrame([
-                {"Região": "SP", "Valor de venda": preco_exist, "Valor após os descontos": preco_liq,
-                 "Quantidade de unidades vendidas": un_sp, "Receita": receita_sp, "Impostos": imp_sp_val,
-                 "Custos": custo_sp_total, "Lucro": lucro_sp, "Margem": margem_sp},
-                {"Região": "ES", "Valor de venda": preco_exist, "Valor após os descontos": preco_liq,
-                 "Quantidade de unidades vendidas": un_es, "Receita": receita_es, "Impostos": imp_es_val,
-                 "Custos": custo_es_total, "Lucro": lucro_es, "Margem": margem_es},
-            ])
-
-            st.dataframe(
-                df_reg_exist.style.format({
-                    "Valor de venda": fmt_currency,
-                    "Valor após os descontos": fmt_currency,
-                    "Quantidade de unidades vendidas": lambda v: fmt_int(v),
-                    "Receita": fmt_currency, "Impostos": fmt_currency,
-                    "Custos": fmt_currency, "Lucro": fmt_currency,
-                    "Margem": lambda v: f"{v:.2f}%"
-                }),
-                width="stretch", hide_index=True
-            )
+                                               key="qtd_exist", persist_state="session")
+            filiais_exist = branch_editor(branches, key="filiais_exist")
+            pesos_exist = filiais_exist["% das vendas"].to_numpy(dtype="float64")
+            impostos_exist = filiais_exist["Imposto (%)"].to_numpy(dtype="float64")
+
+            # Custos por filial (se ausente, considera 0)
+            custos_exist = [c or 0.0 for c in custos_exist]
+            with stage("compute"):
+                r = compute_margin(
+                    preco=preco_exist, custos=custos_exist, qtd=qtd_vendas_exist,
+                    pesos=pesos_exist, impostos=impostos_exist,
+                    desc_valor=desc_valor_exist, desc_pct=(desc_tipo_exist == "%"),
+                )
+            regioes_exist = [branch_label(b) for b in branches]
+            render_results(regioes_exist, r)
 
-            # ======= Totais =======
+            # ======= Sensibilidade (desconto × quantidade × divisão entre filiais) =======
             st.markdown("---")
-            st.subheader("🧮 Totais")
-            t1, t2, t3, t4, t5, t6, t7 = st.columns(7)
-            with t1: big_metric("Unidades", fmt_int(un_sp + un_es))
-            with t2: big_metric("Faturamento", fmt_currency(faturamento))
-            with t3: big_metric("Impostos totais", fmt_currency(imp_total))
-            with t4: big_metric("Receita Líquida", fmt_currency(receita_liquida))
-            with t5: big_metric("( - ) CMV", fmt_currency(custo_total))
-            with t6: big_metric("Lucro Bruto", fmt_currency(lucro_bruto_total))
-            with t7: big_metric("Margem Bruta", f"{margem_total:.2f}%")
+            # Só calcula (e importa o altair) com o expander aberto
+            sensibilidade = st.expander("🔬 Sensibilidade: desconto × quantidade × divisão entre filiais",
+                                        key="sensibilidade", on_change="rerun")
+            if sensibilidade.open:
+                with sensibilidade:
+                    render_sensitivity(preco_exist, custos_exist, impostos_exist, pesos_exist, branches)
 
             # ======= Download em planilha (CSV) - PRODUTO EXISTENTE =======
-            st.markdown("---")
-            df_export_exist = df_reg_exist.copy()
-            df_export_exist.loc[len(df_export_exist)] = {
-                "Região": "TOTAL",
-                "Valor de venda": preco_exist,
-                "Valor após os descontos": preco_liq,
-                "Quantidade de unidades vendidas": un_sp + un_es,
-                "Receita": receita_sp + receita_es,
-                "Impostos": imp_total,
-                "Custos": custo_total,
-                "Lucro": lucro_bruto_total,
-                "Margem": margem_total,
-            }
-            csv_exist = df_export_exist.to_csv(index=False, sep=";", encoding="utf-8-sig")
-            st.download_button(
-                "📥 Baixar resultados",
-                data=csv_exist,
-                file_name="resultado_produto_existente.csv",
-                mime="text/csv",
-            )
+            render_download(regioes_exist, r, "resultado_produto_existente.csv")
+
+if tab_exist.open:
+    with tab_exist:
+        render_existing_tab()
 
 # --------- ABA 2: PRODUTO NOVO (inclui nome do produto) ---------
-with tab_new:
+@st.fragment
+def render_new_tab():
     st.caption("Simulador para novos produtos.")
 
-    nome_produto_novo = st.text_input("Nome do produto")
-
-    preco_novo = st.number_input("Preço de venda (R$)", min_value=0.0, step=1.0, format="%.2f")
+    nome_produto_novo = st.text_input("Nome do produto", key="nome_novo", persist_state="session")
 
-    col_custos = st.columns(2)
-    with col_custos[0]:
-        custo_sp = st.number_input("Custo SP (R$)", min_value=0.0, step=1.0, format="%.2f")
-    with col_custos[1]:
-        custo_es = st.number_input("Custo ES (R$)", min_value=0.0, step=1.0, format="%.2f")
+    preco_novo = st.number_input("Preço de venda (R$)", min_value=0.0, step=1.0, format="%.2f", key="preco_novo",
+                                 persist_state="session")
 
     col_desc = st.columns(2)
     with col_desc[0]:
-        desc_tipo = st.radio("Tipo de desconto", options=["%", "R$"], horizontal=True)
+        desc_tipo = st.radio("Tipo de desconto", options=["%", "R$"], horizontal=True, key="desc_tipo_novo",
+                             persist_state="session")
     with col_desc[1]:
-        desc_valor = st.number_input(f"Desconto ({desc_tipo})", min_value=0.0, step=0.5, format="%.2f")
-
-    qtd_vendas = st.number_input("Quantidade de Vendas (un.)", min_value=0, step=1, value=0)
-    pct_sp = st.number_input("% SP", min_value=0.0, max_value=100.0, step=1.0, value=50.0, format="%.2f")
-    pct_es = st.number_input("% ES", min_value=0.0, max_value=100.0, step=1.0, value=50.0, format="%.2f")
-
-    col_imp = st.columns(2)
-    with col_imp[0]:
-        imposto_sp_pct = st.number_input("Imposto SP (%)", min_value=0.0, max_value=100.0, step=0.5, format="%.2f")
-    with col_imp[1]:
-        imposto_es_pct = st.number_input("Imposto ES (%)", min_value=0.0, max_value=100.0, step=0.5, format="%.2f")
-
-    total_pct = pct_sp + pct_es
-    w_sp = pct_sp / total_pct if total_pct else 0.5
-    w_es = pct_es / total_pct if total_pct else 0.5
-    un_sp = int(qtd_vendas * w_sp)
-    un_es = int(qtd_vendas - un_sp)
-
-    if desc_tipo == "%":
-        preco_liq = preco_novo * (1 - desc_valor / 100.0)
-    else:
-        preco_liq = max(preco_novo - desc_valor, 0.0)
-
-    receita_sp = preco_liq * un_sp
-    receita_es = preco_liq * un_es
-    imp_sp_val = receita_sp * (imposto_sp_pct / 100.0)
-    imp_es_val = receita_es * (imposto_es_pct / 100.0)
-    custo_sp_total = custo_sp * un_sp
-    custo_es_total = custo_es * un_es
-    lucro_sp = receita_sp - imp_sp_val - custo_sp_total
-    lucro_es = receita_es - imp_es_val - custo_es_total
-    margem_sp = (lucro_sp / receita_sp * 100.0) if receita_sp > 0 else 0.0
-    margem_es = (lucro_es / receita_es * 100.0) if receita_es > 0 else 0.0
-
-    faturamento = preco_novo * (un_sp + un_es)
-    descontos_totais = (preco_novo - preco_liq) * (un_sp + un_es)
-    receita_total = receita_sp + receita_es
-    imp_total = imp_sp_val + imp_es_val
-    receita_liquida = faturamento - descontos_totais - imp_total
-    custo_total = custo_sp_total + custo_es_total
-    lucro_bruto = receita_liquida - custo_total
-    margem_total = (lucro_bruto / receita_liquida * 100.0) if receita_liquida > 0 else 0.0
-
-    # ======= Resultados por Região (TABELA) =======
-    st.markdown("---")
-    st.subheader("📊 Resultados por Região")
+        desc_valor = st.number_input(f"Desconto ({desc_tipo})", min_value=0.0, step=0.5, format="%.2f",
+                                     key="desc_valor_novo", persist_state="session")
+
+    qtd_vendas = st.number_input("Quantidade de Vendas (un.)", min_value=0, step=1, value=0, key="qtd_novo",
+                                 persist_state="session")
+
+    # Custos, distribuição e impostos por filial (linhas podem ser incluídas)
+    filiais_novo = branch_editor([BRANCH_SP, BRANCH_ES], key="filiais_novo", com_custo=True)
+    if filiais_novo.empty:
+        st.warning("Inclua ao menos uma filial.")
+        return
+    regioes_novo = [f or f"Filial {i + 1}" for i, f in enumerate(filiais_novo["Filial"].fillna(""))]
+
+    with stage("compute"):
+        r = compute_margin(
+            preco=preco_novo, custos=filiais_novo["Custo (R$)"].to_numpy(dtype="float64"), qtd=qtd_vendas,
+            pesos=filiais_novo["% das vendas"].to_numpy(dtype="float64"),
+            impostos=filiais_novo["Imposto (%)"].to_numpy(dtype="float64"),
+            desc_valor=desc_valor, desc_pct=(desc_tipo == "%"),
+        )
+
+    # ======= Resultados por Região (TABELA) + Totais =======
+    render_results(regioes_novo, r)
 
-    df_reg = pd.DataFrame([
-        {"Região": "SP", "Valor de venda": preco_novo, "Valor após os descontos": preco_liq,
-         "Quantidade de unidades vendidas": un_sp, "Receita": receita_sp, "Impostos": imp_sp_val,
-         "Custos": custo_sp_total, "Lucro": lucro_sp, "Margem": margem_sp},
-        {"Região": "ES", "Valor de venda": preco_novo, "Valor após os descontos": preco_liq,
-         "Quantidade de unidades vendidas": un_es, "Receita": receita_es, "Impostos": imp_es_val,
-         "Custos": custo_es_total, "Lucro": lucro_es, "Margem": margem_es},
-    ])
-
-    st.dataframe(
-        df_reg.style.format({
-            "Valor de venda": fmt_currency,
-            "Valor após os descontos": fmt_currency,
-            "Quantidade de unidades vendidas": lambda v: fmt_int(v),
-            "Receita": fmt_currency, "Impostos": fmt_currency,
-            "Custos": fmt_currency, "Lucro": fmt_currency,
-            "Margem": lambda v: f"{v:.2f}%"
-        }),
-        width="stretch", hide_index=True
-    )
+    # ======= Download em planilha (CSV) - PRODUTO NOVO =======
+    render_download(regioes_novo, r, "resultado_produto_novo.csv")
 
-    # ======= Totais =======
-    st.markdown("---")
-    st.subheader("🧮 Totais")
-    t1, t2, t3, t4, t5, t6, t7 = st.columns(7)
-    with t1: big_metric("Unidades", fmt_int(un_sp + un_es))
-    with t2: big_metric("Faturamento", fmt_currency(faturamento))
-    with t3: big_metric("Impostos totais", fmt_currency(imp_total))
-    with t4: big_metric("Receita Líquida", fmt_currency(receita_liquida))
-    with t5: big_metric("( - ) CMV", fmt_currency(custo_total))
-    with t6: big_metric("Lucro Bruto", fmt_currency(lucro_bruto))
-    with t7: big_metric("Margem Bruta", f"{margem_total:.2f}%")
+if tab_new.open:
+    with tab_new:
+        render_new_tab()
 
-    # ======= Download em planilha (CSV) - PRODUTO NOVO =======
-    st.markdown("---")
-    df_export_new = df_reg.copy()
-    df_export_new.loc[len(df_export_new)] = {
-        "Região": "TOTAL",
-        "Valor de venda": preco_novo,
-        "Valor após os descontos": preco_liq,
-        "Quantidade de unidades vendidas": un_sp + un_es,
-        "Receita": receita_sp + receita_es,
-        "Impostos": imp_total,
-        "Custos": custo_total,
-        "Lucro": lucro_bruto,
-        "Margem": margem_total,
-    }
-    csv_new = df_export_new.to_csv(index=False, sep=";", encoding="utf-8-sig")
-    st.download_button(
-        "📥 Baixar resultados",
-        data=csv_new,
-        file_name="resultado_produto_novo.csv",
-        mime="text/csv",
+# --------- ABA 3: CATÁLOGO COMPLETO ---------
+@st.fragment
+def render_catalog_tab():
+    st.caption("Margem de todos os produtos da planilha com os mesmos parâmetros.")
+    try:
+        catalogo_cat = load_catalog(SHEET_ID, SHEET_NAME)
+    except Exception as e:
+        catalogo_cat = None
+        st.error(f"Erro ao carregar planilha pública: {e}")
+
+    if catalogo_cat is None or catalogo_cat["tabela"].empty:
+        st.warning("Planilha vazia ou inacessível.")
+    else:
+        col_desc_cat = st.columns(2)
+        with col_desc_cat[0]:
+            desc_tipo_cat = st.radio("Tipo de desconto", options=["%", "R$"], horizontal=True, key="desc_tipo_cat",
+                                     persist_state="session")
+        with col_desc_cat[1]:
+            desc_valor_cat = st.number_input(f"Desconto ({desc_tipo_cat})", min_value=0.0, step=0.5,
+                                             format="%.2f", key="desc_valor_cat", persist_state="session")
+
+        qtd_cat = st.number_input("Quantidade de Vendas por produto (un.)", min_value=0, step=1, value=1,
+                                  key="qtd_cat", persist_state="session")
+        branches_cat = tuple(margin_branches(catalogo_cat["branches"]))
+        filiais_cat = branch_editor(branches_cat, key="filiais_cat")
+
+        params_cat = dict(
+            qtd=qtd_cat, desc_valor=desc_valor_cat, desc_pct=(desc_tipo_cat == "%"),
+            pesos=tuple(filiais_cat["% das vendas"].tolist()),
+            impostos=tuple(filiais_cat["Imposto (%)"].tolist()),
+        )
+
+        # ======= Ordenação e paginação =======
+        st.markdown("---")
+        colunas_cat = report_columns(branches_cat)
+        col_ord = st.columns(3)
+        with col_ord[0]:
+            ordenar_por = st.selectbox("Ordenar por", options=colunas_cat,
+                                       index=colunas_cat.index("Margem"), key="ordem_cat", persist_state="session")
+        with col_ord[1]:
+            por_pagina = st.selectbox("Linhas por página", options=[50, 100, 500], index=1, key="por_pagina_cat",
+                                      persist_state="session")
+        with col_ord[2]:
+            crescente = st.checkbox("Crescente (piores margens primeiro)", value=True, key="crescente_cat",
+                                    persist_state="session")
+
+        with stage("compute"):
+            df_cat = catalog_report(catalogo_cat["versao"], branches_cat, tuple(params_cat.items()), ordenar_por,
+                                    crescente, catalogo_cat["tabela"])
+        n_paginas = max(1, -(-len(df_cat) // por_pagina))
+        pagina = st.number_input(f"Página (de {n_paginas})", min_value=1, max_value=n_paginas, value=1, step=1,
+                                 key="pagina_cat", persist_state="session")
+        inicio = (int(pagina) - 1) * por_pagina
+
+        # Formatação feita pelo próprio st.dataframe (sem Styler)
+        moeda = st.column_config.NumberColumn(format="R$ %.2f")
+        pct = st.column_config.NumberColumn(format="%.2f%%")
+        with stage("render"):
+            st.dataframe(
+                df_cat.iloc[inicio:inicio + por_pagina],
+                column_config={
+                    c: (pct if c.startswith("Margem") else moeda)
+                    for c in colunas_cat
+                    if c.startswith(("Valor", "Custo", "Margem")) or c in
+                    ("Faturamento", "Impostos", "Receita Líquida", "Custos", "Lucro")
+                },
+                width="stretch", hide_index=True
+            )
+        st.caption(f"{fmt_int(len(df_cat))} produtos")
+
+        # ======= Exportação (catálogo inteiro) =======
+        st.markdown("---")
+        formato_cat = st.radio("Formato", options=["CSV", "Parquet"], horizontal=True, key="formato_cat",
+                               persist_state="session")
+        chave_export = (branches_cat, tuple(params_cat.items()), ordenar_por, crescente, formato_cat,
+                        catalogo_cat["versao"])
+        if st.button("Gerar arquivo", key="gerar_export_cat"):
+            try:
+                if formato_cat == "CSV":
+                    dados = (to_csv_bytes(df_cat), "margens_catalogo.csv", "text/csv")
+                else:
+                    dados = (to_parquet_bytes(df_cat), "margens_catalogo.parquet", "application/octet-stream")
+                st.session_state["export_cat"] = (chave_export, dados)
+            except ImportError as e:
+                st.error(f"Exportação em Parquet indisponível: {e}")
+
+        export_cat = st.session_state.get("export_cat")
+        if export_cat and export_cat[0] == chave_export:
+            dados_export, nome_export, mime_export = export_cat[1]
+            st.download_button(
+                "📥 Baixar resultados",
+                data=dados_export,
+                file_name=nome_export,
+                mime=mime_export,
+                key="download_cat",
+            )
+
+        # ======= Histórico: o que mudou entre duas versões da planilha =======
+        st.markdown("---")
+        st.subheader("🕘 Mudanças na planilha")
+        historico = snapshot_history(SHEET_ID, SHEET_NAME)
+        versoes = historico.versions()
+        if not historico.enabled:
+            st.info("Histórico indisponível: instale o pyarrow.")
+        elif len(versoes) < 2:
+            st.caption("Ainda não há versão anterior registrada; as mudanças aparecem aqui quando a planilha mudar.")
+        else:
+            rotulos = {
+                v["versao"]: f"{time.strftime('%d/%m/%Y %H:%M', time.localtime(v['gravado_em']))} · "
+                             f"{fmt_int(v['produtos'])} produtos · {v['versao'][:8]}"
+                for v in versoes
+            }
+            col_ver = st.columns(2)
+            with col_ver[0]:
+                antes = st.selectbox("Versão anterior", options=list(rotulos), index=1,
+                                     format_func=rotulos.get, key="versao_antes", persist_state="session")
+            with col_ver[1]:
+                depois = st.selectbox("Versão nova", options=list(rotulos), index=0,
+                                      format_func=rotulos.get, key="versao_depois", persist_state="session")
+
+            with stage("compute"):
+                df_diff = version_diff(antes, depois, branches_cat, tuple(params_cat.items()), historico)
+            contagem = df_diff["Situação"].value_counts()
+            d1, d2, d3 = st.columns(3)
+            with d1: big_metric("Preço/custo alterado", fmt_int(contagem.get(STATUS_CHANGED, 0)))
+            with d2: big_metric("Produtos novos", fmt_int(contagem.get(STATUS_NEW, 0)))
+            with d3: big_metric("Produtos removidos", fmt_int(contagem.get(STATUS_REMOVED, 0)))
+
+            st.caption("Margens calculadas com os parâmetros acima; piores variações primeiro.")
+            with stage("render"):
+                st.dataframe(
+                    df_diff.head(1000),
+                    column_config={
+                        c: (pct if c.startswith(("Margem", "Variação")) else moeda)
+                        for c in df_diff.columns if c not in ("Código", "Produto", "Situação")
+                    },
+                    width="stretch", hide_index=True
+                )
+            if len(df_diff) > 1000:
+                st.caption(f"Mostrando 1.000 de {fmt_int(len(df_diff))} produtos (arquivo completo abaixo).")
+            if not df_diff.empty:
+                st.download_button("📥 Baixar mudanças", data=to_csv_bytes(df_diff),
+                                   file_name=f"mudancas_{antes[:8]}_{depois[:8]}.csv", mime="text/csv",
+                                   key="download_diff")
+
+if tab_catalog.open:
+    with tab_catalog:
+        render_catalog_tab()
+
+# --------- ABA 4: PROPOSTAS EM LOTE ---------
+@st.fragment
+def render_bulk_tab():
+    st.caption("Envie um CSV/XLSX com uma proposta por linha para calcular todas de uma vez.")
+    st.markdown(
+        "Colunas: **Produto** e **Quantidade** (obrigatórias); **Desconto** (%) ou **Desconto (R$)**; "
+        "**% SP**, **% ES**… (% das vendas por filial); **Imposto** ou **Imposto SP**, **Imposto ES**…"
     )
+    try:
+        catalogo_lote = load_catalog(SHEET_ID, SHEET_NAME)
+    except Exception as e:
+        st.error(f"Erro ao carregar planilha pública: {e}")
+        return
+    if catalogo_lote["tabela"].empty:
+        st.warning("Planilha vazia ou inacessível.")
+        return
+
+    arquivo = st.file_uploader("Arquivo de propostas", type=["csv", "xlsx"], key="upload_propostas")
+    if arquivo is None:
+        return
+
+    chave_lote = (arquivo.file_id, catalogo_lote["versao"])
+    if st.button("Calcular propostas", key="calcular_propostas"):
+        fmt = "xlsx" if arquivo.name.lower().endswith(".xlsx") else "csv"
+        buf = io.BytesIO()
+        try:
+            with st.spinner("Calculando..."), stage("compute"):
+                resumo = write_enriched_csv(arquivo.getvalue(), fmt, catalogo_lote["tabela"],
+                                            margin_branches(catalogo_lote["branches"]), buf)
+            st.session_state["propostas"] = (chave_lote, resumo, buf.getvalue())
+        except ValueError as e:
+            st.error(str(e))
+
+    propostas = st.session_state.get("propostas")
+    if propostas and propostas[0] == chave_lote:
+        _, resumo, dados = propostas
+        m1, m2, m3, m4 = st.columns(4)
+        with m1: big_metric("Propostas", fmt_int(resumo["linhas"]))
+        with m2: big_metric("Faturamento", fmt_money(resumo["faturamento"]))
+        with m3: big_metric("Lucro Bruto", fmt_money(resumo["lucro"]))
+        with m4:
+            margem = 100.0 * resumo["lucro"] / resumo["receita_liquida"] if resumo["receita_liquida"] > 0 else 0.0
+            big_metric("Margem Bruta", fmt_pct(margem))
+        if resumo["nao_encontrados"]:
+            st.warning(f"{fmt_int(resumo['nao_encontrados'])} proposta(s) com produto fora da planilha "
+                       f"(coluna Encontrado = Não).")
+        if resumo["qtd_invalidas"]:
+            st.warning(f"{fmt_int(resumo['qtd_invalidas'])} proposta(s) com quantidade não numérica ou fracionária, "
+                       f"calculada(s) com 0 unidades (coluna Quantidade válida = Não).")
+        if resumo["previa"] is not None:
+            st.caption(f"Prévia ({len(resumo['previa'])} primeiras linhas)")
+            st.dataframe(resumo["previa"], width="stretch", hide_index=True)
+        st.download_button(
+            "📥 Baixar resultados",
+            data=dados,
+            file_name="propostas_calculadas.csv",
+            mime="text/csv",
+            key="download_propostas",
+        )
+
+if tab_bulk.open:
+    with tab_bulk:
+        render_bulk_tab()
+
+# --------- PAINEL DE DESEMPENHO (opcional) ---------
+@st.fragment
+def render_debug_panel():
+    st.subheader("⏱️ Desempenho")
+    st.button("Atualizar", key="atualizar_debug")
+    st.caption("Tempos por etapa neste processo (janela das últimas execuções).")
+    st.dataframe(pd.DataFrame(METRICS.summary()), hide_index=True, width="stretch",
+                 column_config={c: st.column_config.NumberColumn(format="%.1f")
+                                for c in ("p50 (ms)", "p95 (ms)", "máx (ms)")})
+    contadores = [{"contador": nome, "rótulos": ", ".join(f"{k}={v}" for k, v in labels), "total": valor}
+                  for (nome, labels), valor in sorted(METRICS.counters().items())]
+    if contadores:
+        st.dataframe(pd.DataFrame(contadores), hide_index=True, width="stretch")
+    with st.expander("Formato Prometheus"):
+        st.code(METRICS.prometheus_text(), language="text")
+
+if DEBUG_PANEL or st.query_params.get("debug") == "1":
+    with st.sidebar:
+        render_debug_panel()
+
+METRICS.write_textfile()
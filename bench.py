@@ -0,0 +1,224 @@
+# bench.py
+"""
+Benchmark dos caminhos quentes (sem Streamlit e sem rede), com planilhas
+sintéticas no formato da planilha real (valores pt-BR, 'R$', NBSP, células
+vazias e inválidas).
+
+Etapas medidas, para cada tamanho:
+  leitura          CSV -> DataFrame tipado (`sources.read_table`: cabeçalhos
+                   com `normalize`, dtypes e `parse_money_column`)
+  parse_escalar    Custo com `parse_money_ptbr` e average_price com
+                   `parse_number_loose`, célula a célula (referência)
+  parse_vetorizado as mesmas colunas com `parse_money_column` (mesmos valores)
+  catalogo         `catalog.build_catalog`
+  busca_produto    consultas de produto no índice do catálogo
+  margens          `report.catalog_margins` do catálogo inteiro
+  cenarios         `parallel.evaluate_scenarios`: catálogo × SCENARIOS cenários
+                   (em processos a partir de `parallel.MIN_PARALLEL` avaliações)
+  formatacao       texto pt-BR (`formatting`) das colunas numéricas do relatório
+  export_csv       `report.to_csv_bytes`
+
+Uso:
+    python bench.py                          # 1k, 10k e 100k linhas
+    python bench.py --rows 1000 1000000      # tamanhos escolhidos
+    python bench.py --save base.json         # grava a referência
+    python bench.py --compare base.json      # falha (exit 1) se alguma etapa
+                                             # ficar mais lenta que a tolerância
+
+Partida da interface (tempo até a primeira renderização): ver bench_startup.py.
+"""
+import argparse
+import gc
+import io
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from catalog import BRANCH_ES, BRANCH_SP, build_catalog, default_weights
+from formatting import fmt_money, fmt_pct
+from parallel import evaluate_scenarios
+from parsing import parse_money_column, parse_money_ptbr, parse_number_loose
+from report import catalog_margins, to_csv_bytes
+from sources import read_table
+
+DEFAULT_ROWS = [1_000, 10_000, 100_000]
+BRANCHES = [BRANCH_SP, "VP-03", BRANCH_ES]
+LOOKUPS = 1_000
+SCENARIOS = [{"qtd": q, "desc_valor": d, "impostos": 12.0} for q in (10, 100, 1000) for d in range(0, 20, 2)]
+
+
+def _ptbr(valores: np.ndarray) -> np.ndarray:
+    """1234.5 -> '1.234,50'"""
+    en = pd.Series(valores).map("{:,.2f}".format)
+    return en.str.replace(",", "_").str.replace(".", ",").str.replace("_", ".").to_numpy()
+
+
+def synthetic_sheet(rows: int, seed: int = 0) -> bytes:
+    """
+    CSV com `rows` linhas (uma por produto × filial), imitando a exportação
+    da planilha: custo em pt-BR com/sem 'R$' e NBSP, average_price em en-US
+    ou pt-BR, ~2% de células vazias e ~0,5% de valores não reconhecidos.
+    """
+    rng = np.random.default_rng(seed)
+    n_branches = len(BRANCHES)
+    produtos = np.arange(rows) // n_branches
+    codigos = pd.Series(produtos).map("P{:07d}".format).to_numpy()
+
+    custo = _ptbr(rng.uniform(1, 5_000, rows).round(2))
+    prefixo = rng.choice(["R$ ", "R$\u00a0", ""], rows)
+    custo = np.char.add(prefixo.astype(str), custo.astype(str)).astype(object)
+
+    preco_num = rng.uniform(1, 8_000, rows).round(2)
+    preco = np.where(rng.random(rows) < 0.5, pd.Series(preco_num).map("{:.2f}".format), _ptbr(preco_num))
+    preco = preco.astype(object)
+
+    vazio = rng.random(rows) < 0.02
+    custo[vazio] = ""
+    preco[rng.random(rows) < 0.02] = ""
+    custo[rng.random(rows) < 0.005] = "n/d"
+
+    df = pd.DataFrame({
+        "Produto": codigos,
+        "Branch": np.array(BRANCHES)[np.arange(rows) % n_branches],
+        "Custo": custo,
+        "average_price": preco,
+        "Product_Name": pd.Series(produtos).map("Produto Ação nº {}".format).to_numpy(),
+    })
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def _stages(raw: bytes) -> list:
+    """(nome, função) na ordem do pipeline; cada função recebe o estado anterior."""
+    estado = {}
+    rng = np.random.default_rng(1)
+    # Colunas de valores ainda como texto, entrada das duas etapas de parse
+    texto = pd.read_csv(io.BytesIO(raw), usecols=["Custo", "average_price"], dtype=str)
+
+    def leitura():
+        estado["df"] = read_table(raw, "csv")
+
+    def parse_escalar():
+        [parse_money_ptbr(v) for v in texto["Custo"].fillna("").tolist()]
+        [parse_number_loose(v) for v in texto["average_price"].fillna("").tolist()]
+
+    def parse_vetorizado():
+        parse_money_column(texto["Custo"])
+        parse_money_column(texto["average_price"], loose=True)
+
+    def catalogo():
+        estado["catalogo"] = build_catalog(estado["df"])
+
+    def busca_produto():
+        itens, produtos = estado["catalogo"]["itens"], estado["catalogo"]["produtos"]
+        for i in rng.integers(0, len(produtos), LOOKUPS):
+            itens.get(produtos[i])
+
+    def margens():
+        branches = estado["catalogo"]["branches"]
+        estado["relatorio"] = catalog_margins(
+            estado["catalogo"]["tabela"], branches, pesos=default_weights(branches),
+            impostos=12.0, qtd=100, desc_valor=5.0, desc_pct=True,
+        )
+
+    def cenarios():
+        catalogo = estado["catalogo"]
+        evaluate_scenarios(catalogo["tabela"], catalogo["branches"], SCENARIOS)
+
+    def formatacao():
+        relatorio = estado["relatorio"]
+        for c in relatorio.select_dtypes("number").columns:
+            (fmt_pct if c.startswith("Margem") else fmt_money)(relatorio[c].to_numpy())
+
+    def export_csv():
+        to_csv_bytes(estado["relatorio"])
+
+    return [("leitura", leitura), ("parse_escalar", parse_escalar), ("parse_vetorizado", parse_vetorizado),
+            ("catalogo", catalogo),
+            ("busca_produto", busca_produto), ("margens", margens), ("cenarios", cenarios),
+            ("formatacao", formatacao),
+            ("export_csv", export_csv)]
+
+
+def run(rows: int, repeat: int = 3) -> dict:
+    """
+    Executa o pipeline `repeat` vezes (tempo = melhor execução) e mais uma
+    vez com tracemalloc para o pico de memória de cada etapa.
+    Retorna {etapa: {"segundos": ..., "pico_mb": ...}}.
+    """
+    raw = synthetic_sheet(rows)
+    tempos = {}
+    for _ in range(repeat):
+        for nome, fn in _stages(raw):
+            gc.collect()
+            t0 = time.perf_counter()
+            fn()
+            tempos[nome] = min(tempos.get(nome, float("inf")), time.perf_counter() - t0)
+
+    resultado = {}
+    tracemalloc.start()
+    try:
+        for nome, fn in _stages(raw):
+            gc.collect()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn()
+            pico = tracemalloc.get_traced_memory()[1] - base
+            resultado[nome] = {"segundos": round(tempos[nome], 6), "pico_mb": round(pico / 2**20, 2)}
+    finally:
+        tracemalloc.stop()
+    return resultado
+
+
+def compare(atual: dict, base: dict, tolerancia: float, minimo: float = 0.005) -> list[str]:
+    """Etapas mais lentas que a referência além da tolerância (ignora etapas < `minimo` s)."""
+    regressoes = []
+    for rows, etapas in atual.items():
+        for nome, med in etapas.items():
+            ref = base.get(rows, {}).get(nome)
+            if ref is None or max(ref["segundos"], med["segundos"]) < minimo:
+                continue
+            if med["segundos"] > ref["segundos"] * (1 + tolerancia):
+                regressoes.append(f"{rows} linhas / {nome}: {ref['segundos']:.4f}s -> {med['segundos']:.4f}s")
+    return regressoes
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark da calculadora de margem")
+    ap.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="tamanhos da planilha")
+    ap.add_argument("--repeat", type=int, default=3, help="execuções por tamanho (vale a melhor)")
+    ap.add_argument("--save", help="grava os resultados neste JSON")
+    ap.add_argument("--compare", help="JSON de referência gerado com --save")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="folga sobre a referência (0.25 = 25%%)")
+    args = ap.parse_args(argv)
+
+    resultados = {}
+    for rows in args.rows:
+        resultados[str(rows)] = run(rows, args.repeat)
+        print(f"\n{rows:,} linhas".replace(",", "."))
+        print(f"  {'etapa':<18}{'tempo (s)':>12}{'pico (MB)':>12}")
+        for nome, med in resultados[str(rows)].items():
+            print(f"  {nome:<18}{med['segundos']:>12.4f}{med['pico_mb']:>12.2f}")
+        etapas = resultados[str(rows)]
+        ganho = etapas["parse_escalar"]["segundos"] / max(etapas["parse_vetorizado"]["segundos"], 1e-9)
+        print(f"  parse vetorizado: {ganho:.1f}x mais rápido que o escalar")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressoes = compare(resultados, json.load(f), args.tolerance)
+        if regressoes:
+            print("\nRegressões:\n  " + "\n  ".join(regressoes))
+            return 1
+        print("\nSem regressões.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# bench_startup.py
+"""
+Benchmark de partida da interface: tempo até a primeira renderização (uma
+execução completa do app.py, via streamlit.testing) em um processo novo,
+com planilha sintética local (sem rede).
+
+Cenários (cada um em um processo Python separado, importações a frio):
+  produto_novo         aba "Produto novo", sem snapshot em disco
+  existente_frio       aba "Produto existente", sem snapshot em disco
+                       (lê, interpreta e indexa a planilha)
+  existente_snapshot   idem, com o snapshot já gravado por outro processo
+  existente_aquecido   idem, depois de `server.warm_up()` (partida do servidor)
+
+Para cada cenário: partida (importar o Streamlit), aquecimento (só no
+aquecido), primeira renderização e se a planilha foi carregada.
+
+Uso:
+    python bench_startup.py                     # 100k linhas, meta de 1,0 s
+    python bench_startup.py --rows 500000 --target 0.5
+    python bench_startup.py --save partida.json
+Sai com 1 se a primeira renderização de produto_novo ou existente_aquecido
+passar da meta.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+SCENARIOS = {
+    # nome: (aba, snapshot em disco, aquecer)
+    "produto_novo": ("Produto novo", False, False),
+    "existente_frio": ("Produto existente", False, False),
+    "existente_snapshot": ("Produto existente", True, False),
+    "existente_aquecido": ("Produto existente", True, True),
+}
+TARGETED = ("produto_novo", "existente_aquecido")
+
+
+def _child(cenario: str) -> dict:
+    """Roda no processo filho: mede e devolve os tempos."""
+    t0 = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    medidas = {"partida": time.perf_counter() - t0, "aquecimento": 0.0}
+
+    aba, _, aquecer = SCENARIOS[cenario]
+    if aquecer:
+        t = time.perf_counter()
+        from server import warm_up
+        warm_up()
+        medidas["aquecimento"] = time.perf_counter() - t
+
+    at = AppTest.from_file(APP_PATH, default_timeout=300)
+    at.session_state["aba"] = aba
+    t = time.perf_counter()
+    at.run()
+    medidas["primeira_renderizacao"] = time.perf_counter() - t
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+    from metrics import METRICS
+    medidas["planilha"] = any(nome == "snapshot_cache" for nome, _ in METRICS.counters())
+    medidas["altair"] = "altair" in sys.modules
+    return medidas
+
+
+def _run_child(cenario: str, env: dict) -> dict:
+    saida = subprocess.run([sys.executable, __file__, "--child", cenario], env=env, check=True,
+                           capture_output=True, text=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def run(rows: int) -> dict:
+    from bench import synthetic_sheet  # planilha no mesmo formato do bench.py
+
+    with tempfile.TemporaryDirectory() as tmp:
+        planilha = os.path.join(tmp, "planilha.csv")
+        with open(planilha, "wb") as f:
+            f.write(synthetic_sheet(rows))
+        env = {**os.environ, "DATA_SOURCE": planilha}
+
+        resultados = {}
+        for cenario, (_, com_snapshot, _) in SCENARIOS.items():
+            env["SNAPSHOT_DIR"] = os.path.join(tmp, "snapshot" if com_snapshot else f"vazio-{cenario}")
+            if com_snapshot and not os.path.isdir(env["SNAPSHOT_DIR"]):
+                _run_child("existente_frio", env)  # grava o snapshot
+            resultados[cenario] = _run_child(cenario, env)
+        return resultados
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Tempo até a primeira renderização da calculadora")
+    ap.add_argument("--rows", type=int, default=100_000, help="linhas da planilha sintética")
+    ap.add_argument("--target", type=float, default=1.0,
+                    help="meta (s) da primeira renderização em " + " e ".join(TARGETED))
+    ap.add_argument("--save", help="grava os resultados neste JSON")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(_child(args.child)))
+        return 0
+
+    resultados = run(args.rows)
+    print(f"\n{args.rows:,} linhas".replace(",", "."))
+    print(f"  {'cenário':<20}{'partida (s)':>13}{'aquecimento (s)':>17}{'1ª render. (s)':>16}  planilha  altair")
+    for cenario, m in resultados.items():
+        print(f"  {cenario:<20}{m['partida']:>13.3f}{m['aquecimento']:>17.3f}{m['primeira_renderizacao']:>16.3f}"
+              f"  {'sim' if m['planilha'] else 'não':<8}  {'sim' if m['altair'] else 'não'}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({str(args.rows): resultados}, f, indent=2)
+
+    acima = [c for c in TARGETED if resultados[c]["primeira_renderizacao"] > args.target]
+    if acima:
+        print(f"\nAcima da meta de {args.target:.2f}s: {', '.join(acima)}")
+        return 1
+    print(f"\nDentro da meta de {args.target:.2f}s.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# catalog.py
+"""
+Índice do catálogo montado uma vez por versão da planilha: os reruns da
+interface (e os cálculos em lote) só fazem consultas.
+"""
+import pandas as pd
+
+BRANCH_SP = "VP-01"
+BRANCH_ES = "VP-06"
+# Filial única das planilhas sem coluna de filial (custo vazio = 0)
+NO_BRANCH = "-"
+
+# Região conhecida de cada filial: (sigla, nome). As demais aparecem pelo código.
+BRANCH_REGIONS = {BRANCH_SP: ("SP", "São Paulo"), BRANCH_ES: ("ES", "Espírito Santo"),
+                  NO_BRANCH: ("Geral", "Sem filial")}
+
+
+def branch_label(branch: str, long: bool = False) -> str:
+    """'SP' / 'São Paulo (VP-01)' para filiais conhecidas; o próprio código para as demais."""
+    regiao = BRANCH_REGIONS.get(branch)
+    if regiao is None:
+        return branch
+    if branch == NO_BRANCH:
+        return regiao[1] if long else regiao[0]
+    return f"{regiao[1]} ({branch})" if long else regiao[0]
+
+
+def margin_branches(branches) -> list[str]:
+    """Filiais usadas no cálculo de margem: as da planilha ou, sem nenhuma, só NO_BRANCH."""
+    return list(branches) or [NO_BRANCH]
+
+
+def default_weights(branches) -> list[float]:
+    """% das vendas inicial: 50/50 entre SP e ES quando existem; senão divisão igual."""
+    branches = list(branches)
+    if BRANCH_SP in branches and BRANCH_ES in branches:
+        return [50.0 if b in (BRANCH_SP, BRANCH_ES) else 0.0 for b in branches]
+    return [round(100.0 / len(branches), 2)] * len(branches) if branches else []
+
+
+def build_catalog(df: pd.DataFrame) -> dict:
+    """
+    Recebe o DataFrame tipado de `sources.apply_schema` e devolve:
+      - produtos: códigos ordenados e sem repetição
+      - itens: código -> nome, custo por branch e preço de venda
+        (average_price da VP-01, senão qualquer um do produto)
+      - branches: filiais presentes na planilha, ordenadas
+      - tabela: uma linha por produto (nome, preco e um custo por branch)
+    """
+    catalogo = {"linhas": len(df), "produtos": [], "itens": {}, "branches": [],
+                "tabela": pd.DataFrame(columns=["nome", "preco"]),
+                "invalidos": {"custo": int(df["custo_invalido"].sum()),
+                              "preco": int(df["preco_invalido"].sum())}}
+
+    base = df.dropna(subset=["produto"])
+    if base.empty:
+        return catalogo
+    base = base.assign(produto=base["produto"].astype(str),
+                       nome=base["nome"].astype(object),
+                       branch=base["branch"].astype(object))
+
+    produtos = sorted(base["produto"].unique().tolist())
+    itens = {p: {"nome": "", "custos": {}, "preco": 0.0} for p in produtos}
+
+    # Nome: primeiro não vazio do produto
+    nomes = base.dropna(subset=["nome"]).drop_duplicates("produto")
+    for codigo, nome in zip(nomes["produto"], nomes["nome"]):
+        itens[codigo]["nome"] = nome
+
+    # Custo: primeira linha de cada (produto, branch)
+    custos = base.dropna(subset=["branch"]).drop_duplicates(["produto", "branch"])
+    for codigo, branch, custo in zip(custos["produto"], custos["branch"], custos["custo"]):
+        itens[codigo]["custos"][branch] = float(custo)
+
+    # Preço: average_price da VP-01; fallback para qualquer average_price do produto
+    precos = base.dropna(subset=["preco"])
+    precos = pd.concat([precos[precos["branch"] == BRANCH_SP], precos]).drop_duplicates("produto")
+    for codigo, preco in zip(precos["produto"], precos["preco"]):
+        itens[codigo]["preco"] = float(preco)
+
+    tabela = pd.DataFrame({
+        "nome": [itens[p]["nome"] for p in produtos],
+        "preco": [itens[p]["preco"] for p in produtos],
+    }, index=pd.Index(produtos, name="codigo"))
+    tabela = tabela.join(custos.pivot(index="produto", columns="branch", values="custo"))
+
+    catalogo["branches"] = sorted(custos["branch"].unique().tolist())
+    catalogo["produtos"] = produtos
+    catalogo["itens"] = itens
+    catalogo["tabela"] = tabela
+    return catalogo
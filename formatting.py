@@ -0,0 +1,72 @@
+# formatting.py
+"""
+Formatação pt-BR de colunas inteiras com operações do NumPy (sem lambda
+por célula). Aceitam escalar (devolvem str) ou array (devolvem array de str).
+"""
+import numpy as np
+
+# NumPy >= 2: funções de texto como ufuncs em C; antes, np.char
+_s = getattr(np, "strings", np.char)
+
+
+def _group_thousands(inteiro: np.ndarray, sep: str = ".") -> np.ndarray:
+    """1234567 -> '1.234.567' (inteiro >= 0)"""
+    grupos = np.ones(inteiro.shape, dtype="int64")
+    resto = inteiro // 1000
+    while (resto > 0).any():
+        grupos += resto > 0
+        resto //= 1000
+
+    txt = None
+    for k in range(int(grupos.max(initial=1))):
+        grupo = ((inteiro // 1000 ** k) % 1000).astype("U3")
+        # só o grupo mais alto fica sem zeros à esquerda
+        grupo = np.where(k < grupos - 1, _s.zfill(grupo, 3), grupo)
+        txt = grupo if txt is None else np.where(k < grupos, _s.add(_s.add(grupo, sep), txt), txt)
+    return txt
+
+
+def _number(values, decimais: int, milhar: str = ".", decimal: str = ",") -> np.ndarray:
+    v = np.asarray(values, dtype="float64")
+    if v.size == 0:
+        return v.astype("U1")
+    escala = 10 ** decimais
+    # NaN, ±inf e valores que não cabem em int64 depois da escala viram "—"
+    valido = np.abs(v) * escala < 2.0 ** 62  # NaN também dá False
+    absoluto = np.where(valido, np.abs(v), 0.0)
+    escalado = absoluto * escala
+    inteiros = np.array(np.round(escalado), dtype="int64")  # 0-d continua array
+    # Perto de um empate (x,xx5) o produto por 10**decimais pode cair do lado
+    # errado (12.345 * 100 = 1234.4999...): ali vale o texto de "%.2f", que
+    # arredonda o valor decimal exato como o f-string
+    empate = np.abs(escalado - np.floor(escalado) - 0.5) <= 4 * np.spacing(escalado)
+    if empate.any():
+        fixo = _s.mod(f"%.{decimais}f", absoluto[empate])
+        inteiros[empate] = _s.replace(fixo, ".", "").astype("int64")
+    txt = _group_thousands(inteiros // escala, milhar) if milhar else (inteiros // escala).astype("U")
+    if decimais:
+        frac = _s.zfill((inteiros % escala).astype(f"U{decimais}"), decimais)
+        txt = _s.add(_s.add(txt, decimal), frac)
+    negativo = (v < 0) & (inteiros > 0)
+    return np.where(valido, np.where(negativo, _s.add("-", txt), txt), "—")
+
+
+def _out(values, txt: np.ndarray):
+    return str(txt) if np.ndim(values) == 0 else txt
+
+
+def fmt_money(values):
+    """1234.5 -> 'R$ 1.234,50'"""
+    txt = _number(values, 2)
+    return _out(values, np.where(txt == "—", txt, _s.add("R$ ", txt)))
+
+
+def fmt_int(values):
+    """1234567 -> '1.234.567'"""
+    return _out(values, _number(values, 0))
+
+
+def fmt_pct(values):
+    """12.345 -> '12.35%' (mesmo formato das margens na interface)"""
+    txt = _number(values, 2, milhar="", decimal=".")
+    return _out(values, np.where(txt == "—", txt, _s.add(txt, "%")))
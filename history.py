@@ -0,0 +1,159 @@
+# history.py
+"""
+Histórico das versões da planilha e comparação de margens entre duas versões.
+
+- Cada versão distinta (sha256 do conteúdo) vira um arquivo Arrow IPC sem
+  compressão com a tabela do catálogo (uma linha por produto: código, nome,
+  preço e um custo por filial), lido com memory_map.
+- Só acrescenta: arquivos de versão nunca são reescritos nem apagados, e o
+  índice (historico.jsonl) recebe uma linha por versão nova. Para zerar o
+  histórico, apague o diretório.
+- Sem pyarrow, o histórico fica desligado (nada é gravado).
+- A comparação junta as duas versões pelo código do produto (vetorizado) e
+  recalcula a margem dos produtos alterados com os mesmos parâmetros.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from catalog import branch_label
+from margin import compute_margins
+from report import cost_matrix
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - depende do ambiente
+    feather = None
+
+log = logging.getLogger(__name__)
+
+INDEX_FILE = "historico.jsonl"
+STATUS_NEW, STATUS_REMOVED, STATUS_CHANGED = "Novo", "Removido", "Alterado"
+
+
+class SnapshotHistory:
+    def __init__(self, directory: str, max_loaded: int = 4):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.max_loaded = max_loaded
+        self._lock = threading.Lock()
+        self._loaded = {}  # versão -> tabela (as mais recentes usadas)
+
+    @classmethod
+    def for_snapshot(cls, snapshot) -> "SnapshotHistory":
+        """Histórico ao lado do snapshot (`SheetSnapshot`), separado por origem."""
+        return cls(os.path.join(snapshot.cache_dir, "historico", snapshot.key))
+
+    @property
+    def enabled(self) -> bool:
+        return feather is not None
+
+    def _path(self, versao: str) -> str:
+        return os.path.join(self.directory, f"{versao[:16]}.arrow")
+
+    # ---------- gravação ----------
+    def record(self, versao: str, tabela: pd.DataFrame) -> bool:
+        """Grava a versão se ainda não existir. Retorna se gravou."""
+        if not self.enabled or os.path.exists(self._path(versao)):
+            return False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(versao)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            tabela.reset_index().to_feather(tmp, compression="uncompressed")
+            os.replace(tmp, path)
+            linha = json.dumps({"versao": versao, "gravado_em": time.time(), "produtos": len(tabela)})
+            # Uma única escrita com O_APPEND: linhas de processos diferentes não se misturam
+            fd = os.open(self.index_path, os.O_CREAT | os.O_APPEND | os.O_WRONLY)
+            try:
+                os.write(fd, (linha + "\n").encode("utf-8"))
+            finally:
+                os.close(fd)
+        except OSError:
+            log.warning("Não foi possível gravar a versão %s no histórico", versao[:16])
+            return False
+        return True
+
+    # ---------- leitura ----------
+    def versions(self) -> list[dict]:
+        """Versões gravadas, da mais recente para a mais antiga."""
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                linhas = [json.loads(l) for l in f if l.strip()]
+        except (OSError, ValueError):
+            return []
+        vistas, versoes = set(), []
+        for v in linhas:  # dois processos podem registrar a mesma versão
+            if v["versao"] not in vistas and os.path.exists(self._path(v["versao"])):
+                vistas.add(v["versao"])
+                versoes.append(v)
+        return sorted(versoes, key=lambda v: v["gravado_em"], reverse=True)
+
+    def load(self, versao: str) -> pd.DataFrame:
+        """Tabela da versão (índice = código)."""
+        with self._lock:
+            tabela = self._loaded.pop(versao, None)
+            if tabela is None:
+                table = feather.read_table(self._path(versao), memory_map=True)
+                tabela = table.to_pandas().set_index("codigo")
+            self._loaded[versao] = tabela
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.pop(next(iter(self._loaded)))
+            return tabela
+
+
+def diff_versions(antes: pd.DataFrame, depois: pd.DataFrame, branches, pesos, impostos=0.0,
+                  **params) -> pd.DataFrame:
+    """
+    Produtos novos, removidos ou com preço/custo alterado entre duas tabelas
+    do catálogo (índice = código), com a margem de cada versão calculada com
+    os mesmos pesos/impostos/parâmetros de `compute_margins`.
+    """
+    branches = list(branches)
+    campos = ["preco", *branches]
+    a = antes.reindex(columns=["nome", *campos])
+    b = depois.reindex(columns=["nome", *campos])
+    juntas = a.merge(b, how="outer", left_index=True, right_index=True, suffixes=("_a", "_b"),
+                     indicator=True, validate="one_to_one")
+
+    em_a = (juntas["_merge"] != "right_only").to_numpy()
+    em_b = (juntas["_merge"] != "left_only").to_numpy()
+    va = juntas[[f"{c}_a" for c in campos]].to_numpy(dtype="float64", na_value=np.nan)
+    vb = juntas[[f"{c}_b" for c in campos]].to_numpy(dtype="float64", na_value=np.nan)
+    alterado = (~np.isclose(va, vb, rtol=0.0, atol=1e-9) & ~(np.isnan(va) & np.isnan(vb))).any(axis=1)
+    situacao = np.select([~em_a, ~em_b, alterado], [STATUS_NEW, STATUS_REMOVED, STATUS_CHANGED], "")
+    juntas = juntas[situacao != ""]
+    situacao = situacao[situacao != ""]
+
+    def margens(sufixo: str) -> dict:
+        tabela = juntas[[f"{c}_{sufixo}" for c in campos]].set_axis(campos, axis=1)
+        return compute_margins(preco=tabela["preco"].to_numpy(dtype="float64", na_value=0.0),
+                               custos=cost_matrix(tabela, branches), pesos=pesos, impostos=impostos, **params)
+
+    ra, rb = margens("a"), margens("b")
+    presente_a = (situacao != STATUS_NEW)
+    presente_b = (situacao != STATUS_REMOVED)
+    dados = {
+        "Código": juntas.index.to_numpy(),
+        "Produto": juntas["nome_b"].fillna(juntas["nome_a"]).fillna("").to_numpy(),
+        "Situação": situacao,
+        "Valor de venda (antes)": juntas["preco_a"].to_numpy(dtype="float64", na_value=np.nan),
+        "Valor de venda (depois)": juntas["preco_b"].to_numpy(dtype="float64", na_value=np.nan),
+    }
+    for b_ in branches:
+        rotulo = branch_label(b_)
+        dados[f"Custo {rotulo} (antes)"] = juntas[f"{b_}_a"].to_numpy(dtype="float64", na_value=np.nan)
+        dados[f"Custo {rotulo} (depois)"] = juntas[f"{b_}_b"].to_numpy(dtype="float64", na_value=np.nan)
+    dados.update({
+        "Lucro (antes)": np.where(presente_a, ra["lucro_bruto"], np.nan),
+        "Lucro (depois)": np.where(presente_b, rb["lucro_bruto"], np.nan),
+        "Margem (antes)": np.where(presente_a, ra["margem_total"], np.nan),
+        "Margem (depois)": np.where(presente_b, rb["margem_total"], np.nan),
+    })
+    dados["Variação da margem (p.p.)"] = dados["Margem (depois)"] - dados["Margem (antes)"]
+    return pd.DataFrame(dados)
@@ -0,0 +1,214 @@
+# margin.py
+"""
+Cálculo de margem sem Streamlit: recebe arrays (um elemento por produto /
+cenário) e devolve todas as colunas por filial (branch) e os totais de uma vez.
+
+Convenção de formas: parâmetros do produto/cenário (preço, quantidade,
+desconto) têm forma (...); parâmetros por filial (custos, pesos das vendas,
+impostos) têm forma (..., N), uma posição por filial.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+# Colunas por filial devolvidas por `compute_margins` (forma (..., N))
+BRANCH_FIELDS = ["un", "receita", "imp", "custo", "lucro", "margem"]
+# Totais devolvidos por `compute_margins` (forma (...))
+TOTAL_FIELDS = ["preco", "preco_liq", "unidades", "faturamento", "descontos_totais",
+                "receita_total", "imp_total", "receita_liquida", "custo_total",
+                "lucro_bruto", "margem_total"]
+
+
+def _pct(num, den):
+    """num / den * 100, com 0 onde den <= 0."""
+    out = np.zeros(np.broadcast(num, den).shape, dtype="float64")
+    np.divide(num * 100.0, den, out=out, where=den > 0)
+    return out
+
+
+def allocate_units(qtd, pesos):
+    """
+    Divide `qtd` unidades inteiras entre as filiais proporcionalmente a `pesos`
+    pelo método dos maiores restos: cada filial recebe a parte inteira e as
+    unidades que sobram vão para os maiores restos (empate: a primeira filial).
+    A soma por linha é sempre `qtd`. Pesos que somam 0 viram divisão igual.
+    """
+    qtd = np.floor(np.asarray(qtd, dtype="float64"))
+    pesos = np.asarray(pesos, dtype="float64")
+    n = pesos.shape[-1]
+    if n == 0:
+        return np.zeros(np.broadcast_shapes(qtd.shape, pesos.shape[:-1]) + (0,), dtype="int64")
+    total = pesos.sum(axis=-1, keepdims=True)
+    w = np.where(total > 0, pesos / np.where(total > 0, total, 1.0), 1.0 / n)
+
+    ideal = qtd[..., None] * w
+    un = np.floor(ideal)
+    resto = (qtd - un.sum(axis=-1))[..., None]
+    # posição de cada filial na ordem decrescente de resto
+    ordem = np.argsort(-(ideal - un), axis=-1, kind="stable")
+    posicao = np.empty_like(ordem)
+    np.put_along_axis(posicao, ordem, np.broadcast_to(np.arange(n), ordem.shape), axis=-1)
+    return (un + (posicao < resto)).astype("int64")
+
+
+def net_price(preco, desc_valor, desc_pct=True):
+    """Preço após o desconto: em % (desc_pct=True) ou em R$ (sem ficar negativo)."""
+    preco = np.asarray(preco, dtype="float64")
+    desc_valor = np.asarray(desc_valor, dtype="float64")
+    return np.where(desc_pct,
+                    preco * (1 - desc_valor / 100.0),
+                    np.maximum(preco - desc_valor, 0.0))
+
+
+def compute_margins(preco, custos, qtd, pesos, impostos=0.0, desc_valor=0.0,
+                    desc_pct=True) -> dict:
+    """
+    Versão em lote do cálculo das abas, para N filiais. Todos os parâmetros
+    aceitam escalar ou array (broadcast do NumPy, ver convenção de formas no
+    topo do módulo). Retorna um dict com BRANCH_FIELDS (forma (..., N)) e
+    TOTAL_FIELDS (forma (...)).
+    """
+    custos = np.nan_to_num(np.atleast_1d(np.asarray(custos, dtype="float64")))
+    pesos = np.atleast_1d(np.asarray(pesos, dtype="float64"))
+    impostos = np.atleast_1d(np.asarray(impostos, dtype="float64"))
+    custos, pesos, impostos = np.broadcast_arrays(custos, pesos, impostos)
+    lead = np.broadcast_shapes(np.shape(preco), np.shape(qtd), np.shape(desc_valor),
+                               np.shape(desc_pct), custos.shape[:-1])
+    shape = lead + custos.shape[-1:]
+    custos, pesos, impostos = (np.broadcast_to(a, shape) for a in (custos, pesos, impostos))
+
+    preco = np.broadcast_to(np.asarray(preco, dtype="float64"), lead)
+    qtd = np.broadcast_to(np.asarray(qtd, dtype="float64"), lead)
+
+    un = allocate_units(qtd, pesos)
+    preco_liq = net_price(preco, np.broadcast_to(desc_valor, lead), np.broadcast_to(desc_pct, lead))
+
+    # Cálculos por filial
+    receita = preco_liq[..., None] * un
+    imp = receita * (impostos / 100.0)
+    custo = custos * un
+    lucro = receita - imp - custo
+
+    # Totais
+    unidades = un.sum(axis=-1)
+    faturamento = preco * unidades
+    descontos_totais = (preco - preco_liq) * unidades
+    imp_total = imp.sum(axis=-1)
+    receita_liquida = faturamento - descontos_totais - imp_total
+    custo_total = custo.sum(axis=-1)
+    lucro_bruto = receita_liquida - custo_total
+
+    return {
+        "un": un, "receita": receita, "imp": imp, "custo": custo, "lucro": lucro,
+        "margem": _pct(lucro, receita),
+        "preco": preco, "preco_liq": preco_liq,
+        "unidades": unidades, "faturamento": faturamento,
+        "descontos_totais": descontos_totais, "receita_total": receita.sum(axis=-1),
+        "imp_total": imp_total, "receita_liquida": receita_liquida,
+        "custo_total": custo_total, "lucro_bruto": lucro_bruto,
+        "margem_total": _pct(lucro_bruto, receita_liquida),
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class MarginResult:
+    """
+    Resultado de um cenário: BRANCH_FIELDS como arrays (N,), um elemento por
+    filial, e TOTAL_FIELDS como float.
+    """
+    un: np.ndarray
+    receita: np.ndarray
+    imp: np.ndarray
+    custo: np.ndarray
+    lucro: np.ndarray
+    margem: np.ndarray
+    preco: float
+    preco_liq: float
+    unidades: float
+    faturamento: float
+    descontos_totais: float
+    receita_total: float
+    imp_total: float
+    receita_liquida: float
+    custo_total: float
+    lucro_bruto: float
+    margem_total: float
+
+    def to_dict(self) -> dict:
+        """Campos em tipos nativos (listas/float), prontos para JSON."""
+        return margin_records({k: np.asarray(getattr(self, k))[None] for k in BRANCH_FIELDS + TOTAL_FIELDS})[0]
+
+
+def margin_records(res: dict) -> list[dict]:
+    """
+    Resultado em lote de `compute_margins` (totais (P,), por filial (P, N))
+    -> um dict por linha em tipos nativos, prontos para JSON. Converte cada
+    coluna uma vez (tolist), não célula a célula.
+    """
+    colunas = {k: np.asarray(res[k]).tolist() for k in BRANCH_FIELDS + TOTAL_FIELDS}
+    return [dict(zip(colunas, valores)) for valores in zip(*colunas.values())]
+
+
+def compute_margin(**kwargs) -> MarginResult:
+    """
+    Um único cenário: mesmos parâmetros de `compute_margins`, com valores
+    escalares (e uma lista por filial).
+    """
+    res = compute_margins(**kwargs)
+    return MarginResult(**{k: (v.reshape(-1, v.shape[-1])[0] if k in BRANCH_FIELDS else v.reshape(-1)[0].item())
+                           for k, v in res.items()})
+
+
+def sensitivity_grid(preco, custos, descontos, quantidades, pesos, impostos=0.0,
+                     desc_pct=True) -> dict:
+    """
+    Avalia todas as combinações cenário de pesos × desconto × quantidade numa
+    única chamada de `compute_margins`. `pesos` tem forma (S, N) (um vetor de
+    pesos por cenário); os totais devolvidos têm forma
+    (S, len(descontos), len(quantidades)).
+    """
+    pesos = np.asarray(pesos, dtype="float64")[:, None, None, :]
+    d = np.asarray(descontos, dtype="float64")[None, :, None]
+    q = np.asarray(quantidades, dtype="float64")[None, None, :]
+    return compute_margins(preco=preco, custos=custos, qtd=q, pesos=pesos, impostos=impostos,
+                           desc_valor=d, desc_pct=desc_pct)
+
+
+def break_even_discount(preco, custos, quantidades, pesos, impostos=0.0, desc_pct=True):
+    """
+    Desconto (em % ou R$, conforme desc_pct) que zera o lucro bruto, para cada
+    cenário de pesos (S, N) × quantidade: forma (S, len(quantidades)).
+    Resolvido direto (o lucro é linear no preço líquido), sem busca no grid.
+    Valor negativo = prejuízo mesmo sem desconto; NaN = sem unidades vendidas.
+    """
+    pesos = np.asarray(pesos, dtype="float64")[:, None, :]
+    q = np.asarray(quantidades, dtype="float64")[None, :]
+    un = allocate_units(q, pesos)
+
+    # lucro = preco_liq * sum(un * (1 - t)) - sum(custo * un)
+    base = (un * (1 - np.asarray(impostos, dtype="float64") / 100.0)).sum(axis=-1)
+    custo = (un * np.nan_to_num(np.asarray(custos, dtype="float64"))).sum(axis=-1)
+    preco_min = np.full(base.shape, np.nan)
+    np.divide(custo, base, out=preco_min, where=base > 0)
+
+    if not desc_pct:
+        return preco - preco_min
+    if preco <= 0:
+        return np.full(base.shape, np.nan)
+    return (1 - preco_min / preco) * 100.0
+
+
+def vary_share(pesos, indice: int, shares):
+    """
+    Cenários de pesos (S, N): a filial `indice` fica com cada % de `shares` e
+    as demais dividem o restante na proporção dos pesos atuais (ou igualmente,
+    se todas estiverem zeradas).
+    """
+    pesos = np.asarray(pesos, dtype="float64")
+    outros = np.delete(pesos, indice)
+    if len(outros) == 0:
+        return np.full((len(shares), 1), 100.0)
+    soma = outros.sum()
+    proporcao = outros / soma if soma > 0 else np.full(len(outros), 1.0 / len(outros))
+    shares = np.asarray(shares, dtype="float64")[:, None]
+    return np.insert(proporcao[None, :] * (100.0 - shares), indice, shares[:, 0], axis=1)
@@ -0,0 +1,122 @@
+# metrics.py
+"""
+Medição por etapa (fetch, parse, load, index, compute, render) e contadores
+de cache, compartilhados por todas as sessões do processo.
+
+- `stage("nome")` mede a duração de um bloco; as últimas amostras de cada
+  etapa ficam guardadas para p50/p95.
+- `count("nome", **labels)` incrementa um contador (ex.: acertos de cache).
+- Cada medição vai para o log `metrics` em JSON (nível DEBUG).
+- `prometheus_text()` gera o formato texto do Prometheus; com a variável
+  METRICS_TEXTFILE, `write_textfile` grava esse texto para o textfile
+  collector do node_exporter.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+log = logging.getLogger("metrics")
+
+MAX_SAMPLES = 1_000  # amostras guardadas por etapa (janela dos percentis)
+PREFIX = "calculadora_margem"
+TEXTFILE = os.environ.get("METRICS_TEXTFILE")
+
+
+class Metrics:
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=max_samples))
+        self._totals = defaultdict(lambda: [0, 0.0])  # etapa -> [n, soma], desde o início
+        self._counters = defaultdict(int)             # (nome, labels ordenados) -> valor
+        self._written_at = 0.0
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0)
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            self._samples[name].append(seconds)
+            total = self._totals[name]
+            total[0] += 1
+            total[1] += seconds
+        log.debug(json.dumps({"stage": name, "seconds": round(seconds, 6)}))
+
+    def count(self, name: str, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += 1
+        log.debug(json.dumps({"counter": name, **labels}))
+
+    # ---------- leitura ----------
+    def summary(self) -> list[dict]:
+        """Uma linha por etapa: n, p50, p95 e máximo (em ms) da janela recente."""
+        with self._lock:
+            amostras = {k: np.array(v) for k, v in self._samples.items()}
+            totais = {k: tuple(v) for k, v in self._totals.items()}
+        linhas = []
+        for nome in sorted(amostras):
+            a = amostras[nome] * 1000.0
+            linhas.append({"etapa": nome, "n": totais[nome][0],
+                           "p50 (ms)": float(np.percentile(a, 50)),
+                           "p95 (ms)": float(np.percentile(a, 95)),
+                           "máx (ms)": float(a.max())})
+        return linhas
+
+    def counters(self) -> dict:
+        """{(nome, labels): valor}"""
+        with self._lock:
+            return dict(self._counters)
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            amostras = {k: np.array(v) for k, v in self._samples.items()}
+            totais = {k: tuple(v) for k, v in self._totals.items()}
+            contadores = dict(self._counters)
+
+        linhas = [f"# HELP {PREFIX}_stage_seconds Duração de cada etapa (quantis da janela recente).",
+                  f"# TYPE {PREFIX}_stage_seconds summary"]
+        for nome in sorted(amostras):
+            for q in (0.5, 0.95):
+                valor = float(np.quantile(amostras[nome], q))
+                linhas.append(f'{PREFIX}_stage_seconds{{stage="{nome}",quantile="{q}"}} {valor:.6f}')
+            n, soma = totais[nome]
+            linhas.append(f'{PREFIX}_stage_seconds_sum{{stage="{nome}"}} {soma:.6f}')
+            linhas.append(f'{PREFIX}_stage_seconds_count{{stage="{nome}"}} {n}')
+
+        for nome in sorted({k[0] for k in contadores}):
+            linhas.append(f"# TYPE {PREFIX}_{nome}_total counter")
+            for (n, labels), valor in sorted(contadores.items()):
+                if n == nome:
+                    rotulos = ",".join(f'{k}="{v}"' for k, v in labels)
+                    linhas.append(f"{PREFIX}_{nome}_total{{{rotulos}}} {valor}")
+        return "\n".join(linhas) + "\n"
+
+    def write_textfile(self, path: str | None = TEXTFILE, every: float = 10.0):
+        """Grava `prometheus_text()` em `path` (no máximo a cada `every` segundos)."""
+        agora = time.time()
+        if not path or agora - self._written_at < every:
+            return
+        self._written_at = agora
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp, path)
+        except OSError:
+            log.warning("Não foi possível gravar %s", path)
+
+
+METRICS = Metrics()
+stage = METRICS.stage
+count = METRICS.count
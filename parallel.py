@@ -0,0 +1,178 @@
+# parallel.py
+"""
+Avaliação do catálogo inteiro sob vários cenários (desconto, quantidade,
+pesos e impostos por filial), dividida entre processos.
+
+- Entradas (preço e custos) e saídas ficam em memória compartilhada
+  (multiprocessing.shared_memory): os processos leem e escrevem direto nos
+  mesmos arrays, sem copiar/serializar o catálogo.
+- Cada processo calcula uma faixa de produtos, em blocos de até
+  MAX_ELEMENTS posições por chamada de `compute_margins` (memória limitada).
+- Abaixo de MIN_PARALLEL avaliações (produtos × cenários), roda no próprio
+  processo: subir o pool custaria mais que o cálculo.
+
+Uso pela linha de comando (revisão de preços do fechamento):
+    python parallel.py cenarios.json resultado.parquet [--workers 8]
+com cenarios.json = [{"nome": "...", "qtd": 10, "desc_valor": 5, "desc_pct": true,
+                      "pesos": [50, 50], "impostos": 12}, ...]
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from catalog import default_weights, margin_branches
+from margin import TOTAL_FIELDS, compute_margins
+from report import cost_matrix
+
+DEFAULT_FIELDS = ("faturamento", "receita_liquida", "lucro_bruto", "margem_total")
+MIN_PARALLEL = 2_000_000   # produtos × cenários
+MAX_ELEMENTS = 2_000_000   # produtos × cenários × filiais por bloco
+
+
+def scenario_arrays(cenarios, branches) -> dict:
+    """Lista de cenários (dicts com os parâmetros de `catalog_margins`) -> arrays (S,) / (S, N)."""
+    n = len(branches)
+    padrao = default_weights(branches)
+
+    def por_filial(valor, default):
+        valor = default if valor is None else valor
+        return np.broadcast_to(np.asarray(valor, dtype="float64"), (n,))
+
+    return {
+        "qtd": np.array([c.get("qtd", 0) for c in cenarios], dtype="float64"),
+        "desc_valor": np.array([c.get("desc_valor", 0.0) for c in cenarios], dtype="float64"),
+        "desc_pct": np.array([c.get("desc_pct", True) for c in cenarios], dtype=bool),
+        "pesos": np.array([por_filial(c.get("pesos"), padrao) for c in cenarios]).reshape(len(cenarios), n),
+        "impostos": np.array([por_filial(c.get("impostos"), 0.0) for c in cenarios]).reshape(len(cenarios), n),
+    }
+
+
+def _evaluate_range(preco, custos, cen: dict, saida: dict, inicio: int, fim: int):
+    """Calcula os produtos [inicio, fim) de todos os cenários e grava em `saida[campo][:, inicio:fim]`."""
+    s, n = cen["pesos"].shape
+    bloco = max(1, MAX_ELEMENTS // max(1, s * n))
+    for a in range(inicio, fim, bloco):
+        b = min(a + bloco, fim)
+        r = compute_margins(
+            preco=preco[None, a:b], custos=custos[None, a:b, :], qtd=cen["qtd"][:, None],
+            pesos=cen["pesos"][:, None, :], impostos=cen["impostos"][:, None, :],
+            desc_valor=cen["desc_valor"][:, None], desc_pct=cen["desc_pct"][:, None],
+        )
+        for campo, destino in saida.items():
+            destino[:, a:b] = r[campo]
+
+
+# ---------- memória compartilhada ----------
+def _share(array: np.ndarray) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[...] = array
+    return shm, view
+
+
+def _attach(spec):
+    nome, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=nome)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _worker(specs: dict, cen: dict, inicio: int, fim: int):
+    abertos = [(k, *_attach(v)) for k, v in specs.items()]
+    try:
+        arrays = {k: view for k, _, view in abertos}
+        saida = {k[len("out:"):]: v for k, v in arrays.items() if k.startswith("out:")}
+        _evaluate_range(arrays["preco"], arrays["custos"], cen, saida, inicio, fim)
+    finally:
+        # as views precisam sair de cena antes do close()
+        arrays = saida = None
+        for _, shm, _ in abertos:
+            shm.close()
+
+
+def evaluate_scenarios(tabela: pd.DataFrame, branches, cenarios, campos=DEFAULT_FIELDS,
+                       workers: int | None = None, min_parallel: int = MIN_PARALLEL) -> dict:
+    """
+    Avalia todos os produtos de `tabela` (índice = código; colunas preco e
+    uma de custo por branch) em todos os `cenarios`. Retorna
+    {campo: array (S, P)} para cada campo de TOTAL_FIELDS pedido.
+    """
+    campos = list(campos)
+    desconhecidos = set(campos) - set(TOTAL_FIELDS)
+    if desconhecidos:
+        raise ValueError(f"Campos desconhecidos: {sorted(desconhecidos)}")
+
+    branches = margin_branches(branches)
+    preco = tabela["preco"].to_numpy(dtype="float64")
+    custos = cost_matrix(tabela, branches)
+    cen = scenario_arrays(cenarios, branches)
+    s, p = len(cenarios), len(preco)
+
+    workers = min(workers or os.cpu_count() or 1, max(1, p))
+    if workers <= 1 or s * p < min_parallel:
+        saida = {c: np.empty((s, p)) for c in campos}
+        _evaluate_range(preco, custos, cen, saida, 0, p)
+        return saida
+
+    recursos = {"preco": _share(preco), "custos": _share(custos)}
+    recursos.update({f"out:{c}": _share(np.empty((s, p))) for c in campos})
+    try:
+        specs = {k: (shm.name, view.shape, view.dtype.str) for k, (shm, view) in recursos.items()}
+        limites = np.linspace(0, p, workers * 4 + 1).astype(int)  # mais faixas que processos: balanceia
+        with ProcessPoolExecutor(workers, mp_context=mp.get_context("spawn")) as pool:
+            tarefas = [pool.submit(_worker, specs, cen, int(a), int(b))
+                       for a, b in zip(limites[:-1], limites[1:]) if b > a]
+            for t in tarefas:
+                t.result()
+        return {c: recursos[f"out:{c}"][1].copy() for c in campos}
+    finally:
+        for shm, _ in recursos.values():
+            shm.close()
+            shm.unlink()
+
+
+def scenarios_frame(resultado: dict, tabela: pd.DataFrame, nomes) -> pd.DataFrame:
+    """Formato longo para exportação: uma linha por (cenário, produto)."""
+    s, p = next(iter(resultado.values())).shape
+    df = pd.DataFrame({
+        "Cenário": np.repeat(np.asarray(nomes, dtype=object), p),
+        "Código": np.tile(tabela.index.to_numpy(), s),
+    })
+    for campo, valores in resultado.items():
+        df[campo] = valores.ravel()
+    return df
+
+
+def main(argv=None) -> int:
+    from service import CatalogService
+
+    ap = argparse.ArgumentParser(description="Margem do catálogo inteiro em vários cenários")
+    ap.add_argument("cenarios", help="JSON com a lista de cenários")
+    ap.add_argument("saida", help="arquivo de saída (.parquet ou .csv)")
+    ap.add_argument("--workers", type=int, default=None, help="processos (padrão: núcleos da máquina)")
+    args = ap.parse_args(argv)
+
+    with open(args.cenarios, encoding="utf-8") as f:
+        cenarios = json.load(f)
+    catalogo = CatalogService().get()
+    resultado = evaluate_scenarios(catalogo["tabela"], catalogo["branches"], cenarios, workers=args.workers)
+    df = scenarios_frame(resultado, catalogo["tabela"],
+                         [c.get("nome") or f"Cenário {i + 1}" for i, c in enumerate(cenarios)])
+    if args.saida.endswith(".parquet"):
+        df.to_parquet(args.saida, index=False)
+    else:
+        from report import to_csv_bytes
+        with open(args.saida, "wb") as f:
+            f.write(to_csv_bytes(df))
+    print(f"{len(df):,} linhas em {args.saida}".replace(",", "."))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# parsing.py
+"""
+Normalização de textos e conversão de valores monetários (pt-BR / en-US).
+"""
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Número no formato simples (123, -1.5, 12., .5): convertido direto, sem o regex de limpeza
+_DECIMAL = r"-?(\d+\.?\d*|\.\d+)"
+
+
+def normalize(s: str) -> str:
+    if s is None:
+        return ""
+    s = str(s).strip().lower()
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    s = s.replace("\u00a0", " ")
+    s = " ".join(s.split())
+    return s
+
+
+def parse_money_ptbr(x: str) -> float:
+    if x is None:
+        return 0.0
+    s = str(x)
+    s = s.replace(".", "").replace(",", ".")
+    s = "".join(ch for ch in s if (ch.isdigit() or ch in ".-"))
+    try:
+        return float(s)
+    except:
+        return 0.0
+
+
+def parse_number_loose(x: str) -> float:
+    """
+    Interpreta valores em en-US (1234.56) ou pt-BR (1.234,56) e com/sem 'R$'.
+    """
+    if x is None:
+        return 0.0
+    s = str(x).strip().replace("R$", "").replace("\u00a0", "").replace(" ", "")
+    try:
+        return float(s)
+    except:
+        return parse_money_ptbr(s)
+
+
+def parse_money_column(col: pd.Series, loose: bool = False,
+                       empty: float = 0.0) -> tuple[pd.Series, pd.Series]:
+    """
+    Versão vetorizada de `parse_money_ptbr` (ou de `parse_number_loose`, com
+    loose=True) para uma coluna inteira. Retorna (valores float64, máscara
+    de células preenchidas que não puderam ser interpretadas). Células
+    vazias viram `empty` e as não interpretáveis viram 0.0, como nas versões
+    escalares. Colunas já numéricas (ex.: Parquet) passam direto.
+    """
+    if pd.api.types.is_numeric_dtype(col):
+        return col.astype("float64").fillna(empty), pd.Series(False, index=col.index)
+
+    # Converte só os valores distintos (colunas de % / imposto se repetem
+    # muito); a amostra evita o factorize quando quase tudo é distinto
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        codes, distintos = col.cat.codes.to_numpy(), col.cat.categories.append(pd.Index([None]))
+    else:
+        amostra = col.iloc[::max(1, len(col) // 1000)]
+        codes = distintos = None
+        if amostra.nunique(dropna=False) * 2 <= len(amostra):
+            codes, distintos = pd.factorize(col.astype("string"), use_na_sentinel=False)
+    if distintos is not None and len(distintos) < len(col):
+        valores, invalido = parse_money_column(pd.Series(distintos, dtype="string"), loose, empty)
+        return (pd.Series(valores.to_numpy()[codes], index=col.index),
+                pd.Series(invalido.to_numpy()[codes], index=col.index))
+
+    txt = col.astype("string").str.strip()
+    vazio = (txt.isna() | (txt == "") | (txt.str.lower() == "nan")).to_numpy(dtype=bool)
+
+    # Só substituições literais e um fullmatch (rápidos no Arrow); as células
+    # em outro formato ('n/d', '1e5'...) passam pela conversão completa abaixo.
+    # Tirar 'R$', NBSP e espaços não muda o pt-BR: o regex descarta tudo que
+    # não for dígito, '.' ou '-'.
+    limpo = (txt.str.replace("R$", "", regex=False)
+                .str.replace("\u00a0", "", regex=False)
+                .str.replace(" ", "", regex=False))
+    # pt-BR: '.' é milhar, ',' é decimal
+    def ptbr(s):
+        return _decimal(s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+
+    if loose:
+        txt = limpo
+        valores = _decimal(txt)  # en-US primeiro (1234.56); se falhar, pt-BR
+        resto = np.isnan(valores) & ~vazio
+        valores[resto] = ptbr(limpo[resto])
+    else:
+        valores = ptbr(limpo)
+
+    lento = np.isnan(valores) & ~vazio
+    if lento.any():
+        valores[lento] = _parse_slow(txt[lento], loose)
+
+    invalido = np.isnan(valores) & ~vazio
+    valores = np.where(vazio, empty, np.where(invalido, 0.0, valores))
+    return pd.Series(valores, index=col.index), pd.Series(invalido, index=col.index)
+
+
+def _decimal(txt: pd.Series) -> np.ndarray:
+    """float das células no formato simples -?123.45 (conversão em C); demais = NaN."""
+    ok = txt.str.fullmatch(_DECIMAL, na=False).to_numpy(dtype=bool)
+    valores = np.full(len(txt), np.nan)
+    if getattr(txt.dtype, "storage", None) == "pyarrow":
+        # cast do próprio Arrow (o caminho padrão cria um float Python por célula)
+        valores[ok] = txt[ok].astype("float64[pyarrow]").to_numpy(dtype="float64")
+    else:
+        valores[ok] = txt[ok].to_numpy(dtype="float64")
+    return valores
+
+
+def _parse_slow(txt: pd.Series, loose: bool) -> np.ndarray:
+    """Mesmas regras de `parse_money_ptbr` / `parse_number_loose` para qualquer texto."""
+    ptbr = (txt.str.replace(".", "", regex=False)
+               .str.replace(",", ".", regex=False)
+               .str.replace(r"[^0-9.\-]", "", regex=True))
+    valores = pd.to_numeric(ptbr, errors="coerce")
+    if loose:
+        direto = pd.to_numeric(txt, errors="coerce")
+        valores = direto.where(direto.notna(), valores)
+    return valores.to_numpy(dtype="float64")
@@ -0,0 +1,199 @@
+# proposals.py
+"""
+Propostas em lote: arquivo CSV/XLSX com uma linha por proposta (produto,
+quantidade, desconto, % das vendas e imposto por filial), cruzado com o
+catálogo pelo código do produto e calculado em blocos com `compute_margins`.
+
+Colunas reconhecidas (cabeçalhos comparados com `normalize`):
+  produto      obrigatória (mesmos nomes aceitos na planilha de custos)
+  quantidade   obrigatória
+  desconto     em %; ou "desconto (r$)" para desconto em reais
+  % <filial>   % das vendas por filial, ex.: "% SP", "% VP-06" (ausente: padrão)
+  imposto      imposto (%) de todas as filiais, ou "imposto <filial>" por filial
+Valores aceitam formato pt-BR ou en-US; na quantidade, "1.000" é mil (milhar
+pt-BR), não 1,0, e quantidade fracionária ("1,5") é inválida (0 unidades).
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+from catalog import branch_label, default_weights, margin_branches
+from margin import compute_margins
+from parsing import normalize, parse_money_column
+from report import write_csv_frames
+from sources import CANDIDATES_PROD
+
+CANDIDATES_QTD = ["quantidade", "qtd", "qtde", "quantidade de vendas", "unidades", "quantity"]
+CANDIDATES_DESC_PCT = ["desconto", "desconto (%)", "desconto %", "% desconto", "discount"]
+CANDIDATES_DESC_RS = ["desconto (r$)", "desconto r$", "desconto em r$"]
+CANDIDATES_TAX = ["imposto", "imposto (%)", "imposto %", "impostos", "tax"]
+
+CHUNK_ROWS = 50_000
+
+# Inteiro com separador de milhar pt-BR ("1.000", "12.500"): en-US leria 1,0 / 12,5
+_MILHAR_PTBR = r"-?\d{1,3}(\.\d{3})+"
+
+
+def _aliases(branch: str) -> list[str]:
+    return list(dict.fromkeys([normalize(branch_label(branch)), normalize(branch)]))
+
+
+def detect_proposal_columns(columns, branches) -> dict:
+    """
+    Mapeia os cabeçalhos do arquivo (originais) para os campos da proposta.
+    Levanta ValueError se faltar produto ou quantidade.
+    """
+    por_nome = {}
+    for c in columns:
+        por_nome.setdefault(normalize(c), c)
+
+    def achar(candidatos):
+        return next((por_nome[c] for c in candidatos if c in por_nome), None)
+
+    cols = {
+        "prod": achar(CANDIDATES_PROD),
+        "qtd": achar(CANDIDATES_QTD),
+        "desc_pct": achar(CANDIDATES_DESC_PCT),
+        "desc_rs": achar(CANDIDATES_DESC_RS),
+        "imposto": achar(CANDIDATES_TAX),
+        "pesos": {}, "impostos": {},
+    }
+    for b in branches:
+        for a in _aliases(b):
+            peso = achar([f"% {a}", f"%{a}", f"{a} %", f"{a} (%)", f"% vendas {a}"])
+            if peso and b not in cols["pesos"]:
+                cols["pesos"][b] = peso
+            imposto = achar([f"imposto {a}", f"imposto {a} (%)", f"imposto {a} %", f"imposto (%) {a}"])
+            if imposto and b not in cols["impostos"]:
+                cols["impostos"][b] = imposto
+
+    if not cols["prod"] or not cols["qtd"]:
+        raise ValueError(f"Não encontrei colunas de produto/quantidade. Colunas: {list(columns)}")
+    return cols
+
+
+def _csv_sep(raw: bytes) -> str:
+    """';' (comum em planilhas pt-BR) ou ',' conforme a primeira linha."""
+    primeira = raw[:4096].split(b"\n", 1)[0]
+    return ";" if primeira.count(b";") > primeira.count(b",") else ","
+
+
+def read_proposals(raw: bytes, fmt: str, chunk_rows: int = CHUNK_ROWS):
+    """Blocos de até `chunk_rows` linhas, tudo como texto (XLSX é lido inteiro)."""
+    if fmt == "xlsx":
+        df = pd.read_excel(io.BytesIO(raw), dtype=str)
+        for start in range(0, max(len(df), 1), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+        return
+    yield from pd.read_csv(io.BytesIO(raw), dtype=str, sep=_csv_sep(raw), chunksize=chunk_rows,
+                           keep_default_na=False, encoding="utf-8-sig")
+
+
+def _number(chunk: pd.DataFrame, col, default) -> np.ndarray:
+    if col is None:
+        return np.full(len(chunk), default, dtype="float64")
+    valores, _ = parse_money_column(chunk[col], loose=True, empty=default)
+    return valores.to_numpy(dtype="float64")
+
+
+def _quantity(chunk: pd.DataFrame, col) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Quantidade (>= 0) e máscara das células preenchidas inválidas: não
+    numéricas ou fracionárias, calculadas com 0 unidades em vez de truncadas.
+    """
+    txt = chunk[col].astype("string").str.strip()
+    milhar = txt.str.fullmatch(_MILHAR_PTBR, na=False)
+    txt = txt.mask(milhar, txt.str.replace(".", "", regex=False))
+    valores, invalido = parse_money_column(txt, loose=True)
+    valores = valores.to_numpy(dtype="float64")
+    invalido = invalido.to_numpy(dtype=bool) | ~np.isfinite(valores) | (valores != np.floor(valores))
+    return np.where(invalido, 0.0, np.maximum(valores, 0.0)), invalido
+
+
+def enrich(chunk: pd.DataFrame, tabela: pd.DataFrame, branches, cols: dict) -> pd.DataFrame:
+    """
+    Junta o bloco ao catálogo (`tabela`, índice = código) num único merge e
+    acrescenta as colunas calculadas por filial e os totais.
+    """
+    branches = margin_branches(branches)
+    codigos = chunk[cols["prod"]].astype(str).str.strip()
+    base = pd.DataFrame({"codigo": codigos.to_numpy()}).merge(
+        tabela.reindex(columns=["nome", "preco", *branches]),
+        left_on="codigo", right_index=True, how="left", validate="many_to_one",
+    )
+    encontrado = base["preco"].notna().to_numpy()
+
+    padrao = default_weights(branches)
+    pesos = np.column_stack([_number(chunk, cols["pesos"].get(b), padrao[i]) for i, b in enumerate(branches)])
+    imposto_geral = _number(chunk, cols["imposto"], 0.0)
+    impostos = np.column_stack([_number(chunk, cols["impostos"].get(b), np.nan) for b in branches])
+    impostos = np.where(np.isnan(impostos), imposto_geral[:, None], impostos)
+
+    desc_rs = _number(chunk, cols["desc_rs"], 0.0)
+    desc_pct = (desc_rs == 0) if cols["desc_rs"] else np.ones(len(chunk), dtype=bool)
+    desc_valor = np.where(desc_pct, _number(chunk, cols["desc_pct"], 0.0), desc_rs)
+
+    qtd, qtd_invalida = _quantity(chunk, cols["qtd"])
+    qtd = np.where(encontrado, qtd, 0.0)
+    custos = base[branches].to_numpy(dtype="float64", na_value=0.0)
+    r = compute_margins(preco=base["preco"].to_numpy(dtype="float64", na_value=0.0), custos=custos, qtd=qtd,
+                        pesos=pesos, impostos=impostos, desc_valor=desc_valor, desc_pct=desc_pct)
+
+    out = {
+        "Produto (planilha)": base["nome"].fillna("").to_numpy(),
+        "Encontrado": np.where(encontrado, "Sim", "Não"),
+        "Quantidade válida": np.where(qtd_invalida, "Não", "Sim"),
+        "Valor de venda": r["preco"],
+        "Valor após os descontos": r["preco_liq"],
+    }
+    for i, b in enumerate(branches):
+        rotulo = branch_label(b)
+        out[f"Unidades {rotulo}"] = r["un"][:, i]
+        out[f"Lucro {rotulo}"] = r["lucro"][:, i]
+        out[f"Margem {rotulo}"] = r["margem"][:, i]
+    out.update({
+        "Quantidade de unidades vendidas": r["unidades"],
+        "Faturamento": r["faturamento"],
+        "Impostos": r["imp_total"],
+        "Receita Líquida": r["receita_liquida"],
+        "Custos": r["custo_total"],
+        "Lucro": r["lucro_bruto"],
+        "Margem": r["margem_total"],
+    })
+    return pd.concat([chunk.reset_index(drop=True), pd.DataFrame(out)], axis=1)
+
+
+def iter_enriched(raw: bytes, fmt: str, tabela: pd.DataFrame, branches, chunk_rows: int = CHUNK_ROWS):
+    """Gera os blocos já calculados; as colunas são detectadas no primeiro bloco."""
+    cols = None
+    for chunk in read_proposals(raw, fmt, chunk_rows):
+        if cols is None:
+            cols = detect_proposal_columns(chunk.columns, branches)
+        yield enrich(chunk, tabela, branches, cols)
+
+
+def write_enriched_csv(raw: bytes, fmt: str, tabela: pd.DataFrame, branches, buf,
+                       chunk_rows: int = CHUNK_ROWS, preview_rows: int = 100) -> dict:
+    """
+    Calcula o arquivo bloco a bloco e grava o CSV enriquecido em `buf`
+    (ver `report.write_csv_frames`). Retorna um resumo com as primeiras
+    linhas para exibição.
+    """
+    resumo = {"linhas": 0, "nao_encontrados": 0, "qtd_invalidas": 0, "faturamento": 0.0, "lucro": 0.0,
+              "receita_liquida": 0.0, "previa": None}
+
+    def blocos():
+        for bloco in iter_enriched(raw, fmt, tabela, branches, chunk_rows):
+            if resumo["previa"] is None:
+                resumo["previa"] = bloco.head(preview_rows)
+            resumo["nao_encontrados"] += int((bloco["Encontrado"] == "Não").sum())
+            resumo["qtd_invalidas"] += int((bloco["Quantidade válida"] == "Não").sum())
+            resumo["faturamento"] += float(bloco["Faturamento"].sum())
+            resumo["lucro"] += float(bloco["Lucro"].sum())
+            resumo["receita_liquida"] += float(bloco["Receita Líquida"].sum())
+            # centavos no arquivo: números curtos também deixam o to_csv bem mais rápido
+            yield bloco.round(2)
+
+    resumo["linhas"] = write_csv_frames(blocos(), buf)
+    return resumo
@@ -0,0 +1,173 @@
+# report.py
+"""
+Relatório de margem para o catálogo inteiro (sem Streamlit) e exportação
+em CSV por blocos / Parquet; tabela por região de um único cenário.
+"""
+import csv
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - depende do ambiente
+    pa = pa_csv = None
+
+from catalog import branch_label, margin_branches
+from formatting import fmt_int, fmt_money, fmt_pct
+from margin import MarginResult, compute_margins
+
+# Tabela por região (uma linha por filial + TOTAL na exportação)
+REGION_COLUMNS = ["Região", "Valor de venda", "Valor após os descontos", "Quantidade de unidades vendidas",
+                  "Receita", "Impostos", "Custos", "Lucro", "Margem"]
+
+
+def report_columns(branches) -> list[str]:
+    """Colunas do relatório, na ordem de exibição/exportação."""
+    branches = margin_branches(branches)
+    return (["Código", "Produto", "Valor de venda", "Valor após os descontos"]
+            + [f"Custo {branch_label(b)}" for b in branches]
+            + ["Quantidade de unidades vendidas", "Faturamento", "Impostos", "Receita Líquida",
+               "Custos", "Lucro"]
+            + [f"Margem {branch_label(b)}" for b in branches]
+            + ["Margem"])
+
+
+def cost_matrix(tabela: pd.DataFrame, branches) -> np.ndarray:
+    """Custos (P, N) na ordem de `branches`; filial ausente ou custo vazio = 0."""
+    branches = list(branches)
+    custos = np.zeros((len(tabela), len(branches)))
+    for i, b in enumerate(branches):
+        if b in tabela.columns:
+            custos[:, i] = tabela[b].to_numpy(dtype="float64", na_value=0.0)
+    return custos
+
+
+def catalog_margins(tabela: pd.DataFrame, branches, pesos, impostos=0.0, **params) -> pd.DataFrame:
+    """
+    Calcula a margem de todos os produtos de `tabela` (índice = código;
+    colunas nome, preco e uma coluna de custo por branch) com os mesmos
+    pesos/impostos por filial e os mesmos parâmetros de `compute_margins`.
+    Sem filiais, calcula com uma única (`catalog.NO_BRANCH`, custo 0).
+    """
+    branches = margin_branches(branches)
+    custos = cost_matrix(tabela, branches)
+    r = compute_margins(preco=tabela["preco"].to_numpy(dtype="float64"), custos=custos,
+                        pesos=pesos, impostos=impostos, **params)
+
+    dados = {
+        "Código": tabela.index.to_numpy(),
+        "Produto": tabela["nome"].to_numpy(),
+        "Valor de venda": r["preco"],
+        "Valor após os descontos": r["preco_liq"],
+    }
+    for i, b in enumerate(branches):
+        dados[f"Custo {branch_label(b)}"] = custos[:, i]
+    dados.update({
+        "Quantidade de unidades vendidas": r["unidades"],
+        "Faturamento": r["faturamento"],
+        "Impostos": r["imp_total"],
+        "Receita Líquida": r["receita_liquida"],
+        "Custos": r["custo_total"],
+        "Lucro": r["lucro_bruto"],
+    })
+    for i, b in enumerate(branches):
+        dados[f"Margem {branch_label(b)}"] = r["margem"][:, i]
+    dados["Margem"] = r["margem_total"]
+    return pd.DataFrame(dados)
+
+
+def write_csv_frames(frames, buf) -> int:
+    """
+    Escreve o CSV (sep=';', utf-8-sig) em `buf` a partir de uma sequência de
+    DataFrames com as mesmas colunas (cabeçalho só no primeiro), sem montar
+    uma string única com o arquivo inteiro. Retorna o total de linhas.
+    """
+    buf.write("\ufeff".encode("utf-8"))
+    linhas = 0
+    for i, bloco in enumerate(frames):
+        if i == 0:
+            buf.write(bloco.head(0).to_csv(index=False, sep=";").encode("utf-8"))
+        _write_csv_body(bloco, buf)
+        linhas += len(bloco)
+    return linhas
+
+
+def _write_csv_body(bloco: pd.DataFrame, buf):
+    """Linhas do bloco sem cabeçalho; com pyarrow, o writer em C++ (bem mais rápido com floats)."""
+    if pa_csv is not None and len(bloco):
+        try:
+            tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+            opcoes = pa_csv.WriteOptions(include_header=False, delimiter=";", quoting_style="needed")
+            pa_csv.write_csv(tabela, buf, write_options=opcoes)
+            return
+        except (pa.ArrowException, TypeError, ValueError):
+            pass  # tipo que o writer do Arrow não suporta: usa o do pandas
+    buf.write(bloco.to_csv(index=False, sep=";", header=False).encode("utf-8"))
+
+
+def write_csv_chunks(df: pd.DataFrame, buf, chunk_rows: int = 50_000):
+    """`write_csv_frames` de um DataFrame já pronto, em blocos de `chunk_rows` linhas."""
+    blocos = (df.iloc[start:start + chunk_rows] for start in range(0, max(len(df), 1), chunk_rows))
+    write_csv_frames(blocos, buf)
+    return buf
+
+
+def to_csv_bytes(df: pd.DataFrame, chunk_rows: int = 50_000) -> bytes:
+    return write_csv_chunks(df, io.BytesIO(), chunk_rows).getvalue()
+
+
+def to_parquet_bytes(df: pd.DataFrame) -> bytes:
+    """Requer pyarrow (ou fastparquet) instalado."""
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False)
+    return buf.getvalue()
+
+
+def region_columns(r: MarginResult, regioes, total: bool = False) -> dict[str, np.ndarray]:
+    """Colunas da tabela por região direto dos arrays do resultado (com a linha TOTAL, se pedida)."""
+    n = len(regioes)
+    cols = dict(zip(REGION_COLUMNS, [
+        np.asarray(regioes, dtype=object), np.full(n, r.preco), np.full(n, r.preco_liq),
+        r.un, r.receita, r.imp, r.custo, r.lucro, r.margem,
+    ]))
+    if total:
+        linha = ["TOTAL", r.preco, r.preco_liq, r.unidades, r.receita_total, r.imp_total,
+                 r.custo_total, r.lucro_bruto, r.margem_total]
+        cols = {c: np.append(v, np.asarray([x], dtype=v.dtype)) for (c, v), x in zip(cols.items(), linha)}
+    return cols
+
+
+def format_region_columns(cols: dict) -> dict[str, np.ndarray]:
+    """Mesmas colunas já como texto pt-BR (formatação por coluna inteira)."""
+    out = {}
+    for c, v in cols.items():
+        if c == "Região":
+            out[c] = v
+        elif c == "Quantidade de unidades vendidas":
+            out[c] = fmt_int(v)
+        elif c == "Margem":
+            out[c] = fmt_pct(v)
+        else:
+            out[c] = fmt_money(v)
+    return out
+
+
+def region_csv(r: MarginResult, regioes) -> str:
+    """CSV (sep=';') da tabela por região com a linha TOTAL."""
+    cols = region_columns(r, regioes, total=True)
+    buf = io.StringIO()
+    w = csv.writer(buf, delimiter=";", lineterminator="\n")
+    w.writerow(cols)
+    w.writerows(zip(*(v.tolist() for v in cols.values())))
+    return buf.getvalue()
+
+
+def region_json(r: MarginResult, regioes) -> str:
+    """JSON com uma lista de linhas (filiais + TOTAL), mesmas chaves do CSV."""
+    cols = region_columns(r, regioes, total=True)
+    linhas = [dict(zip(cols, valores)) for valores in zip(*(v.tolist() for v in cols.values()))]
+    return json.dumps(linhas, ensure_ascii=False)
@@ -0,0 +1,116 @@
+# search.py
+"""
+Índice de busca de produtos, montado uma vez por versão do catálogo.
+
+Busca por código ou nome, sem diferenciar acentos/maiúsculas (`normalize`),
+e devolve só os N melhores resultados, nesta ordem:
+  1. código exato
+  2. código começando pela busca
+  3. nome começando pela busca (ou alguma palavra do nome)
+  4. busca contida no código ou no nome
+  5. parecidos por trigramas (erros de digitação): fração dos trigramas
+     da busca presentes no produto, a partir de MIN_SIMILARITY
+Empates seguem a ordem do catálogo (códigos ordenados).
+"""
+from collections import defaultdict
+
+import numpy as np
+
+from parsing import normalize
+
+DEFAULT_LIMIT = 50
+MIN_SIMILARITY = 0.5
+
+
+def trigrams(texto: str) -> set[str]:
+    """Trigramas de cada palavra, com espaço nas pontas (como o pg_trgm)."""
+    grams = set()
+    for palavra in texto.split():
+        p = f"  {palavra} "
+        grams.update(p[i:i + 3] for i in range(len(p) - 2))
+    return grams
+
+
+class ProductIndex:
+    def __init__(self, codigos: list[str], nomes: list[str]):
+        self.codigos = list(codigos)
+        self._cod = [normalize(c) for c in self.codigos]
+        self._nome = [normalize(n) for n in nomes]
+
+        # Prefixo: chaves ordenadas + posição original (busca binária)
+        self._cod_sorted, self._cod_ids = self._sorted_keys(self._cod)
+        palavras = [(p, i) for i, nome in enumerate(self._nome) for p in set(nome.split())]
+        palavras += [(nome, i) for i, nome in enumerate(self._nome) if " " in nome]
+        self._nome_sorted, self._nome_ids = self._sorted_keys(*zip(*palavras)) if palavras \
+            else (np.array([], dtype=object), np.array([], dtype="int64"))
+
+        # Trigramas -> produtos que os contêm
+        postings = defaultdict(list)
+        for i, (c, n) in enumerate(zip(self._cod, self._nome)):
+            for g in trigrams(f"{c} {n}"):
+                postings[g].append(i)
+        self._postings = {g: np.asarray(ids, dtype="int64") for g, ids in postings.items()}
+
+    @staticmethod
+    def _sorted_keys(chaves, ids=None):
+        chaves = np.asarray(chaves, dtype=object)
+        ids = np.arange(len(chaves)) if ids is None else np.asarray(ids, dtype="int64")
+        ordem = np.argsort(chaves, kind="stable")
+        return chaves[ordem], ids[ordem]
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def _prefix(self, chaves, ids, q: str) -> np.ndarray:
+        ini = np.searchsorted(chaves, q, side="left")
+        fim = np.searchsorted(chaves, q + "\uffff", side="left")
+        return ids[ini:fim]
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> list[str]:
+        """Códigos dos `limit` produtos mais relevantes para `query`."""
+        q = normalize(query)
+        if not q:
+            return self.codigos[:limit]
+
+        score = {}
+
+        def marcar(ids, nivel: float):
+            for i in ids.tolist():
+                if score.get(i, 0.0) < nivel:
+                    score[i] = nivel
+
+        # Contida no código/nome: candidatos com todos os trigramas internos
+        # (sem os espaços das pontas, que só existem no início das palavras)
+        # de cada palavra da busca; confirmação com `in`
+        internos = {p[i:i + 3] for p in q.split() for i in range(len(p) - 2)}
+        if internos:
+            listas = [self._postings.get(g) for g in internos]
+            if all(ids is not None for ids in listas):
+                comuns = np.bincount(np.concatenate(listas), minlength=len(self))
+                for i in np.flatnonzero(comuns == len(internos)).tolist():
+                    if q in self._cod[i] or q in self._nome[i]:
+                        score[i] = 2.0
+        else:  # palavras curtas demais para trigramas: varredura
+            for i, (c, n) in enumerate(zip(self._cod, self._nome)):
+                if len(score) >= limit * 4:
+                    break
+                if q in c or q in n:
+                    score[i] = 2.0
+
+        # Parecidos: fração dos trigramas da busca presentes no produto
+        grams = trigrams(q)
+        listas = [self._postings[g] for g in grams if g in self._postings]
+        if listas and len(q) >= 3:
+            comuns = np.bincount(np.concatenate(listas), minlength=len(self))
+            candidatos = np.flatnonzero(comuns >= MIN_SIMILARITY * len(grams))
+            for i, s in zip(candidatos.tolist(), (comuns[candidatos] / len(grams)).tolist()):
+                score.setdefault(i, s)
+
+        marcar(self._prefix(self._nome_sorted, self._nome_ids, q), 3.0)
+        prefixo_cod = self._prefix(self._cod_sorted, self._cod_ids, q)
+        marcar(prefixo_cod, 4.0)
+        marcar(prefixo_cod[[self._cod[i] == q for i in prefixo_cod.tolist()]], 5.0)
+
+        melhores = sorted(score, key=lambda i: (-score[i], i))[:limit]
+        return [self.codigos[i] for i in melhores]
+
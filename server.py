@@ -0,0 +1,51 @@
+# server.py
+"""
+Servidor ASGI da interface (st.App) com aquecimento na partida: os módulos
+pesados são importados e o catálogo é carregado (snapshot + índice de busca)
+antes do primeiro acesso, então a primeira sessão não paga por isso.
+
+    uvicorn server:app --port 8501
+
+`streamlit run app.py` continua funcionando, só que sem o aquecimento.
+"""
+import contextlib
+import logging
+import os
+import threading
+
+import streamlit as st
+
+from metrics import stage
+from service import SHEET_ID, SHEET_NAME, shared_service
+
+log = logging.getLogger(__name__)
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def warm_up(sheet_id: str = SHEET_ID, sheet_name: str | None = SHEET_NAME) -> dict:
+    """Importa os módulos das abas e carrega o catálogo do processo (ver `service.shared_service`)."""
+    with stage("warmup"):
+        import altair  # noqa: F401 - gráfico de sensibilidade (importação lenta)
+        import pandas  # noqa: F401
+
+        return shared_service(sheet_id, sheet_name).get()
+
+
+def _warm_up_logged():
+    try:
+        catalogo = warm_up()
+        log.info("Catálogo carregado na partida: %d produtos", len(catalogo["produtos"]))
+    except Exception:
+        log.exception("Falha no aquecimento; o catálogo será carregado no primeiro uso")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    # Em segundo plano: o servidor já aceita conexões; uma sessão que pedir o
+    # catálogo antes do fim espera o mesmo carregamento (lock do CatalogService)
+    threading.Thread(target=_warm_up_logged, name="warmup", daemon=True).start()
+    yield
+
+
+app = st.App(APP_PATH, lifespan=lifespan)
@@ -0,0 +1,191 @@
+# service.py
+"""
+Catálogo e cálculo sem Streamlit, compartilhados pela interface (app.py) e
+pela API (api.py): mesma origem de dados e mesmo snapshot em disco.
+"""
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from catalog import BRANCH_REGIONS, build_catalog, default_weights, margin_branches
+from history import SnapshotHistory
+from margin import compute_margins, margin_records
+from metrics import count, stage
+from search import ProductIndex
+from snapshot import SheetSnapshot
+from sources import DataSource, google_sheet, source_from_config
+
+# Planilha pública
+SHEET_ID = "19-evG-LmVdYxHXNgaeAzAOk3DNzX5G8znqcIdQwgni0"
+SHEET_NAME = None  # None => primeira aba; use "HARDINPUT" p/ forçar
+# Outra origem no lugar da planilha acima: caminho/URL de CSV, XLSX ou Parquet,
+# ou "gsheet:<id>[:<aba>]" (ex.: arquivo local para testes offline)
+DATA_SOURCE = os.environ.get("DATA_SOURCE")
+SHEET_TTL = 300  # segundos até revalidar a planilha
+MAX_QTD = 10**9  # unidades por item de cotação
+
+
+def sheet_source(sheet_id: str = SHEET_ID, sheet_name: str | None = SHEET_NAME) -> DataSource:
+    return source_from_config(DATA_SOURCE) if DATA_SOURCE else google_sheet(sheet_id, sheet_name)
+
+
+def index_catalog(df: pd.DataFrame, versao: str, history: SnapshotHistory | None = None) -> dict:
+    """
+    `build_catalog` + índice de busca, marcado com a versão (sha256) da
+    planilha. Com `history`, a versão também entra no histórico.
+    """
+    count("catalog_cache", result="miss")
+    with stage("index"):
+        catalogo = build_catalog(df)
+        catalogo["busca"] = ProductIndex(catalogo["produtos"],
+                                         [catalogo["itens"][p]["nome"] for p in catalogo["produtos"]])
+    catalogo["versao"] = versao
+    if history is not None:
+        with stage("history"):
+            history.record(versao, catalogo["tabela"])
+    return catalogo
+
+
+class CatalogService:
+    """
+    Catálogo do processo da API: lê o mesmo snapshot em disco da interface e
+    só reindexa quando o conteúdo muda. O snapshot é consultado no máximo a
+    cada `recheck` segundos (entre uma consulta e outra, o catálogo fica em memória).
+    """
+
+    def __init__(self, source: DataSource | None = None, ttl: float = SHEET_TTL,
+                 cache_dir: str | None = None, recheck: float = 1.0):
+        source = source or sheet_source()
+        self.source = source
+        self.snapshot = SheetSnapshot(source.location, source.parse, ttl=ttl, cache_dir=cache_dir,
+                                      namespace=source.namespace)
+        self.history = SnapshotHistory.for_snapshot(self.snapshot)
+        self.recheck = recheck
+        self._lock = threading.Lock()
+        self._catalogo = None
+        self._checked_at = 0.0
+
+    def get(self) -> dict:
+        agora = time.monotonic()
+        catalogo = self._catalogo
+        if catalogo is not None and agora - self._checked_at < self.recheck:
+            return catalogo
+        with self._lock:
+            df, digest = self.snapshot.get()
+            if self._catalogo is None or self._catalogo["versao"] != digest:
+                self._catalogo = index_catalog(df, digest, self.history)
+            self._checked_at = agora
+            return self._catalogo
+
+
+_services: dict = {}
+_services_lock = threading.Lock()
+
+
+def shared_service(sheet_id: str = SHEET_ID, sheet_name: str | None = SHEET_NAME) -> CatalogService:
+    """
+    CatalogService único por planilha no processo: a interface usa o mesmo
+    que o aquecimento do servidor (server.py) já carregou.
+    """
+    with _services_lock:
+        if (sheet_id, sheet_name) not in _services:
+            _services[sheet_id, sheet_name] = CatalogService(sheet_source(sheet_id, sheet_name))
+        return _services[sheet_id, sheet_name]
+
+
+# ---------- cálculo de cotações ----------
+def _branch_index(branches) -> dict:
+    """Código ou sigla (SP/ES) da filial, sem diferenciar maiúsculas -> posição."""
+    idx = {}
+    for i, b in enumerate(branches):
+        idx[b.upper()] = i
+        if b in BRANCH_REGIONS:
+            idx[BRANCH_REGIONS[b][0].upper()] = i
+    return idx
+
+
+def _number(valor, campo: str, maximo: float = math.inf) -> float:
+    """Número finito entre 0 e `maximo`; senão ValueError (mensagem para o cliente da API)."""
+    try:
+        v = math.nan if isinstance(valor, bool) else float(valor)  # true/false do JSON não é número
+    except OverflowError:  # inteiro do JSON grande demais para float
+        v = math.inf
+    except (TypeError, ValueError):  # texto, null, lista...
+        v = math.nan
+    if not 0 <= v <= maximo:  # NaN também falha
+        limite = "" if maximo == math.inf else f" e no máximo {maximo:g}"
+        raise ValueError(f"'{campo}' deve ser um número finito, não negativo{limite}")
+    return v
+
+
+def _per_branch(valor, idx: dict, n: int, padrao, campo: str, maximo: float = math.inf) -> np.ndarray:
+    """Número (todas as filiais), lista na ordem das filiais ou {filial: valor}."""
+    if valor is None:
+        return np.asarray(padrao, dtype="float64")
+    if isinstance(valor, dict):
+        out = np.zeros(n)
+        for k, v in valor.items():
+            if str(k).upper() not in idx:
+                raise ValueError(f"Filial desconhecida em '{campo}': {k}")
+            out[idx[str(k).upper()]] = _number(v, campo, maximo)
+        return out
+    if isinstance(valor, (list, tuple)):
+        if len(valor) != n:
+            raise ValueError(f"'{campo}' precisa de {n} valores (um por filial)")
+        return np.array([_number(v, campo, maximo) for v in valor], dtype="float64")
+    return np.full(n, _number(valor, campo, maximo))
+
+
+def _parse_item(item: dict, catalogo: dict, idx: dict) -> tuple:
+    """Valida um item de cotação; devolve (preço, custos, qtd, pesos, impostos, desconto, desc_pct)."""
+    if not isinstance(item, dict):
+        raise ValueError("Cada item deve ser um objeto JSON")
+    codigo = str(item.get("produto", "")).strip()
+    if codigo not in catalogo["itens"]:
+        raise ValueError(f"Produto não encontrado: {codigo}")
+    qtd = _number(item.get("qtd", 0), "qtd", MAX_QTD)
+    desconto = _number(item.get("desconto", 0.0), "desconto")
+    tipo = item.get("desconto_tipo", "%")
+    if tipo not in ("%", "R$"):
+        raise ValueError("'desconto_tipo' deve ser '%' ou 'R$'")
+
+    branches = margin_branches(catalogo["branches"])
+    dados = catalogo["itens"][codigo]
+    custos = [dados["custos"].get(b, 0.0) for b in branches]
+    pesos = _per_branch(item.get("pesos"), idx, len(branches), default_weights(branches), "pesos")
+    impostos = _per_branch(item.get("impostos"), idx, len(branches), np.zeros(len(branches)), "impostos", 100.0)
+    return dados["preco"], custos, qtd, pesos, impostos, desconto, tipo == "%"
+
+
+def quote_batch(catalogo: dict, itens: list) -> list[dict]:
+    """
+    Calcula vários itens numa única chamada de `compute_margins`. Cada item:
+        {"produto": "P001", "qtd": 10, "desconto": 5, "desconto_tipo": "%" | "R$",
+         "pesos": {"SP": 60, "ES": 40}, "impostos": 12}
+    (pesos/impostos também aceitam lista na ordem de `filiais` ou um número).
+    Itens inválidos voltam com {"erro": ...} sem afetar os demais. Planilha
+    sem filiais: uma só, `catalog.NO_BRANCH` (custo 0).
+    """
+    branches = margin_branches(catalogo["branches"])
+    idx = _branch_index(branches)
+    validos, resultados = [], [None] * len(itens)
+    for i, item in enumerate(itens):
+        try:
+            validos.append((i, _parse_item(item, catalogo, idx)))
+        except (TypeError, ValueError) as e:
+            produto = item.get("produto") if isinstance(item, dict) else None
+            resultados[i] = {"produto": produto, "erro": str(e)}
+
+    if validos:
+        preco, custos, qtd, pesos, impostos, desconto, desc_pct = (np.asarray(c) for c in zip(*(v for _, v in validos)))
+        r = compute_margins(preco=preco, custos=custos, qtd=qtd, pesos=pesos, impostos=impostos,
+                            desc_valor=desconto, desc_pct=desc_pct)
+        for (i, _), campos in zip(validos, margin_records(r)):
+            codigo = str(itens[i]["produto"]).strip()
+            resultados[i] = {"produto": codigo, "nome": catalogo["itens"][codigo]["nome"], "filiais": branches,
+                             **campos}
+    return resultados
@@ -0,0 +1,202 @@
+# snapshot.py
+"""
+Cópia local (em disco) da planilha, compartilhada entre processos.
+
+- O conteúdo baixado é identificado pelo sha256: se a planilha não mudou,
+  não é interpretada de novo.
+- Depois do TTL, o snapshot antigo continua sendo servido enquanto uma
+  thread atualiza em segundo plano (stale-while-revalidate).
+- Os dados ficam em Arrow IPC (feather, sem compressão) lidos com
+  memory_map; sem pyarrow, o snapshot fica só em memória.
+- Acertos/falhas do snapshot e tempos de fetch/parse/load vão para `metrics`.
+- A origem pode ser uma URL ou um arquivo local (útil para testes offline).
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+
+import pandas as pd
+
+from metrics import count, stage
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - depende do ambiente
+    feather = None
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "calculadora-margem")
+)
+
+
+def fetch_bytes(source: str, timeout: float = 30.0) -> bytes:
+    """Baixa `source` (URL) ou lê o arquivo local com esse caminho."""
+    if os.path.exists(source):
+        with open(source, "rb") as f:
+            return f.read()
+    with urllib.request.urlopen(source, timeout=timeout) as resp:
+        return resp.read()
+
+
+class SheetSnapshot:
+    def __init__(self, source: str, parse, ttl: float = 300, cache_dir: str | None = None,
+                 fetch=fetch_bytes, namespace: str = ""):
+        self.source = source
+        self.parse = parse          # bytes -> DataFrame
+        self.ttl = ttl
+        self.fetch = fetch
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # namespace: muda a chave quando `parse` passa a produzir outro formato
+        self.key = hashlib.sha1(f"{source}|{namespace}".encode("utf-8")).hexdigest()[:16]
+        self.meta_path = os.path.join(self.cache_dir, f"{self.key}.json")
+        self.lock_path = os.path.join(self.cache_dir, f"{self.key}.lock")
+
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._df = None
+        self._digest = None
+        self._meta = None  # usado quando não há pyarrow/disco
+
+    # ---------- leitura ----------
+    def get(self) -> tuple[pd.DataFrame, str]:
+        """Retorna (DataFrame, sha256 do conteúdo)."""
+        meta = self._read_meta()
+        if meta is None or not self._has_data(meta["sha256"]):
+            count("snapshot_cache", result="miss")
+            self.refresh()  # partida a frio: precisa esperar
+            meta = self._read_meta()
+        elif time.time() - meta["checked_at"] > self.ttl:
+            count("snapshot_cache", result="stale")
+            self.refresh_in_background()
+        else:
+            count("snapshot_cache", result="hit")
+        try:
+            return self._load(meta["sha256"]), meta["sha256"]
+        except OSError:
+            # Outro processo gravou uma versão nova e apagou esta (`_cleanup`)
+            # entre a leitura do meta e o load: segue para a versão atual
+            count("snapshot_cache", result="removed")
+            meta = self._read_meta()
+            if meta is None or not self._has_data(meta["sha256"]):
+                self.refresh()
+                meta = self._read_meta()
+            return self._load(meta["sha256"]), meta["sha256"]
+
+    def _data_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{self.key}-{digest[:16]}.arrow")
+
+    def _has_data(self, digest: str) -> bool:
+        return self._digest == digest or (feather is not None and os.path.exists(self._data_path(digest)))
+
+    def _load(self, digest: str) -> pd.DataFrame:
+        with self._lock:
+            if self._digest != digest:
+                with stage("load"):
+                    table = feather.read_table(self._data_path(digest), memory_map=True)
+                    self._df, self._digest = table.to_pandas(), digest
+            return self._df
+
+    def _read_meta(self) -> dict | None:
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return self._meta
+
+    # ---------- atualização ----------
+    def refresh(self) -> bool:
+        """Baixa a origem; só interpreta/grava se o conteúdo mudou. Retorna se mudou."""
+        with stage("fetch"):
+            raw = self.fetch(self.source)
+        digest = hashlib.sha256(raw).hexdigest()
+        changed = not self._has_data(digest)
+        count("snapshot_refresh", changed=str(changed).lower())
+        if changed:
+            with stage("parse"):
+                df = self.parse(raw)
+            if feather is not None:
+                path = self._data_path(digest)
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                df.to_feather(tmp, compression="uncompressed")
+                os.replace(tmp, path)
+            with self._lock:
+                self._df, self._digest = df, digest
+
+        meta = {"sha256": digest, "checked_at": time.time(), "source": self.source,
+                "rows": len(self._df) if self._digest == digest else None}
+        self._meta = meta
+        self._write_json(self.meta_path, meta)
+        if changed:
+            self._cleanup(keep=digest)
+        return changed
+
+    def refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            if not self._acquire_file_lock():
+                return  # outro processo já está atualizando
+            try:
+                self.refresh()
+            finally:
+                self._release_file_lock()
+        except Exception:
+            log.exception("Falha ao atualizar snapshot de %s; mantendo a versão anterior", self.source)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    # ---------- arquivos ----------
+    def _acquire_file_lock(self) -> bool:
+        try:
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # lock abandonado (processo morreu no meio da atualização)
+            try:
+                if time.time() - os.path.getmtime(self.lock_path) < max(self.ttl, 60):
+                    return False
+                os.remove(self.lock_path)
+            except OSError:
+                return False
+            return self._acquire_file_lock()
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        return True
+
+    def _release_file_lock(self):
+        try:
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+
+    def _write_json(self, path: str, data: dict):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+        except OSError:
+            log.warning("Não foi possível gravar %s", path)
+
+    def _cleanup(self, keep: str):
+        # Versões antigas; quem ainda tiver o arquivo mapeado continua lendo (POSIX)
+        for path in glob.glob(os.path.join(self.cache_dir, f"{self.key}-*.arrow")):
+            if path != self._data_path(keep):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,168 @@
+# sources.py
+"""
+Origens dos dados (planilha do Google, URL ou arquivo local CSV/XLSX/Parquet).
+
+Toda origem entrega o mesmo DataFrame tipado (ver SCHEMA), com as colunas
+detectadas uma única vez na leitura:
+
+    produto, nome (category), branch (category, maiúsculas),
+    custo (float64), preco (float64, NaN quando vazio),
+    custo_invalido / preco_invalido (bool: célula preenchida não reconhecida)
+"""
+import io
+import os
+import urllib.parse
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from parsing import normalize, parse_money_column
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - depende do ambiente
+    pa = pa_csv = None
+
+# Muda quando o formato do DataFrame tipado muda (invalida snapshots antigos)
+SCHEMA_VERSION = "2"
+SCHEMA = ["produto", "nome", "branch", "custo", "preco", "custo_invalido", "preco_invalido"]
+
+# Colunas candidatas (já normalizadas por `normalize`)
+CANDIDATES_PROD  = ["produto", "produto_nome", "nome", "sku", "codigo", "código", "item"]
+CANDIDATES_COST  = ["custo", "custo medio", "custo médio", "custo unitario",
+                    "custo unitário", "average_cost", "average cost",
+                    "preco_custo", "preço de custo"]
+CANDIDATES_BRANCH = ["branch", "filial"]
+CANDIDATES_PROD_NAME = [
+    "product_name",
+    "product name",
+    "nome_produto",
+    "nome produto",
+    "descricao",
+    "descrição",
+]
+
+
+def detect_columns(columns) -> dict:
+    columns = list(columns)
+    return {
+        "prod": next((c for c in CANDIDATES_PROD if c in columns), None),
+        "cost": next((c for c in CANDIDATES_COST if c in columns), None),
+        "branch": next((c for c in CANDIDATES_BRANCH if c in columns), None),
+        "avg_price": "average_price" if "average_price" in columns else None,
+        "prod_name": next((c for c in CANDIDATES_PROD_NAME if c in columns), None),
+    }
+
+
+def _as_category(col: pd.Series, upper: bool = False) -> pd.Series:
+    """strip (+ upper) aplicado só nas categorias distintas; vazio/'nan' viram NaN."""
+    col = col.astype("category")
+    cats = col.cat.categories.astype(str).str.strip()
+    if upper:
+        cats = cats.str.upper()
+    cats = np.asarray(cats.where(~cats.isin(["", "nan"])), dtype=object)
+    # código -1 (vazio) aponta para o None no fim; funciona também sem categorias
+    valores = np.append(cats, None)[col.cat.codes.to_numpy()]
+    return pd.Series(valores, index=col.index).astype("category")
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Detecta as colunas (cabeçalhos já normalizados) e devolve o DataFrame tipado."""
+    cols = detect_columns(df.columns)
+    if not cols["prod"] or not cols["cost"]:
+        raise ValueError(f"Não encontrei colunas de produto/custo. Colunas: {list(df.columns)}")
+
+    vazio = pd.Series(None, index=df.index, dtype=object)
+    custo, custo_inval = parse_money_column(df[cols["cost"]])
+    if cols["avg_price"]:
+        preco, preco_inval = parse_money_column(df[cols["avg_price"]], loose=True, empty=np.nan)
+    else:
+        preco, preco_inval = pd.Series(np.nan, index=df.index), pd.Series(False, index=df.index)
+
+    return pd.DataFrame({
+        "produto": _as_category(df[cols["prod"]]),
+        "nome": _as_category(df[cols["prod_name"]] if cols["prod_name"] else vazio),
+        "branch": _as_category(df[cols["branch"]] if cols["branch"] else vazio, upper=True),
+        "custo": custo,
+        "preco": preco,
+        "custo_invalido": custo_inval,
+        "preco_invalido": preco_inval,
+    })
+
+
+def _read_csv_text(raw: bytes) -> pd.DataFrame:
+    """
+    CSV com todas as colunas como texto: inferir tipos estragaria códigos
+    ("0012" -> 12, filial "01" -> 1); a conversão para category fica com
+    `_as_category`. O engine="pyarrow" do pandas infere os tipos mesmo com
+    dtype=str, por isso o leitor do Arrow é chamado direto, com os tipos fixos.
+    """
+    if pa_csv is None:
+        return pd.read_csv(io.BytesIO(raw), dtype=str)
+    header = list(pd.read_csv(io.BytesIO(raw), nrows=0).columns)
+    opcoes = pa_csv.ConvertOptions(column_types={c: pa.string() for c in header},
+                                   strings_can_be_null=True)  # vazio = NaN, como no pandas
+    return pa_csv.read_csv(pa.py_buffer(raw), convert_options=opcoes).to_pandas()
+
+
+def read_table(raw: bytes, fmt: str) -> pd.DataFrame:
+    """Lê os bytes no formato indicado, normaliza os cabeçalhos e aplica o schema."""
+    if fmt == "parquet":
+        df = pd.read_parquet(io.BytesIO(raw))
+    elif fmt == "xlsx":
+        df = pd.read_excel(io.BytesIO(raw), dtype=str)
+    else:
+        df = _read_csv_text(raw)
+    df.columns = [normalize(c) for c in df.columns]
+    return apply_schema(df)
+
+
+@dataclass(frozen=True)
+class DataSource:
+    location: str   # URL ou caminho local
+    fmt: str        # "csv", "xlsx" ou "parquet"
+    label: str      # texto exibido na interface
+
+    def parse(self, raw: bytes) -> pd.DataFrame:
+        return read_table(raw, self.fmt)
+
+    @property
+    def namespace(self) -> str:
+        """Formato + versão do schema (compõe a chave do snapshot)."""
+        return f"{self.fmt}|schema={SCHEMA_VERSION}"
+
+
+def _fmt_from_path(path: str) -> str:
+    ext = os.path.splitext(urllib.parse.urlparse(path).path)[1].lower()
+    if ext in (".xlsx", ".xlsm", ".xls"):
+        return "xlsx"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    return "csv"
+
+
+def google_sheet(sheet_id: str, sheet_name: str | None = None) -> DataSource:
+    url = (
+        f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv&sheet={sheet_name}"
+        if sheet_name else
+        f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv"
+    )
+    return DataSource(url, "csv", "Google Sheets")
+
+
+def source_from_config(spec: str) -> DataSource:
+    """
+    `spec` pode ser:
+      - "gsheet:<id>" ou "gsheet:<id>:<aba>"
+      - uma URL http(s) para CSV/XLSX/Parquet
+      - um caminho de arquivo local CSV/XLSX/Parquet
+    """
+    spec = spec.strip()
+    if spec.startswith("gsheet:"):
+        sheet_id, _, sheet_name = spec[len("gsheet:"):].partition(":")
+        return google_sheet(sheet_id, sheet_name or None)
+    if spec.startswith(("http://", "https://")):
+        return DataSource(spec, _fmt_from_path(spec), f"URL ({spec})")
+    return DataSource(os.path.abspath(spec), _fmt_from_path(spec), f"Arquivo local ({os.path.basename(spec)})")